@@ -1,6 +1,7 @@
 import streamlit as st
 import json
 import os
+import re
 import sys
 from typing import Dict, Any, List
 import pandas as pd
@@ -12,9 +13,10 @@ if service_path not in sys.path:
 
 # 导入服务模块
 from service.get_table_schema import get_table_overview, get_simplified_schemas_for_tables
-from service.generate_sql import select_relevant_tables, refine_user_prompt, generate_sql_with_dependencies, validate_final_sql_result, synthesize_answer
+from service.generate_sql import select_relevant_tables, refine_user_prompt, fused_plan, generate_sql_with_dependencies, validate_final_sql_result, synthesize_answer
 from service.execute_and_format import execute_queries_and_format_with_dependencies
 from service.database_service import DatabaseService
+from service import llm_batcher
 from config import DATABASE_CONFIG
 
 # 页面配置
@@ -37,13 +39,74 @@ if 'selected_tables' not in st.session_state:
 if 'table_overview' not in st.session_state:
     st.session_state.table_overview = ""
 
+@st.cache_resource(hash_funcs={dict: lambda d: json.dumps(d, sort_keys=True)})
+def get_db_service(config: Dict[str, Any]) -> DatabaseService:
+    """获取(并缓存)数据库服务，避免每次rerun都重新创建引擎和连接池"""
+    return DatabaseService(config)
+
+@st.cache_data(ttl=600)
+def _cached_table_names(cfg_key: str) -> List[str]:
+    """缓存表名列表，避免每次rerun都重新执行SHOW TABLES类查询"""
+    return get_db_service(json.loads(cfg_key)).get_table_names()
+
+@st.cache_data(ttl=600)
+def _cached_schema_overview(cfg_key: str, use_rel_filter: bool) -> str:
+    """缓存表结构概览，schema一般不会在会话中途变化"""
+    return get_table_overview(json.loads(cfg_key), use_relationship_filter=use_rel_filter)
+
+@st.cache_data(ttl=600)
+def _cached_simplified_schema(cfg_key: str, tables_key: frozenset) -> str:
+    """缓存精简表结构，避免widget变化触发rerun时重复读取schema"""
+    return get_simplified_schemas_for_tables(json.loads(cfg_key), sorted(tables_key))
+
+@st.cache_data
+def _df_and_csv(columns: tuple, rows: tuple):
+    """缓存DataFrame构建与CSV编码，避免每次rerun都重复计算"""
+    df = pd.DataFrame(list(rows), columns=list(columns))
+    return df, df.to_csv(index=False).encode()
+
+@st.fragment
+def render_results(execution_results, final_answer, final_execution_plan):
+    """渲染查询结果。作为fragment独立rerun，不受侧边栏等其他组件影响"""
+    st.markdown("---")
+    st.subheader("📊 查询结果")
+
+    # 显示生成的SQL
+    with st.expander("🔍 查看生成的SQL", expanded=False):
+        if final_execution_plan:
+            for i, step in enumerate(final_execution_plan.get("execution_plan", [])):
+                st.write(f"**步骤 {i+1}: {step.get('description', 'N/A')}**")
+                st.code(step.get('sql', 'N/A'), language='sql')
+
+    # 显示最终答案
+    st.markdown(final_answer)
+
+    # 显示每个步骤的数据结果
+    for idx, result in enumerate(execution_results):
+        if result.get("raw_results"):
+            st.write(f"**{result.get('description')}**")
+            raw_results = result["raw_results"]
+            columns = tuple(raw_results[0].keys())
+            rows = tuple(tuple(row.values()) for row in raw_results)
+            df, csv_bytes = _df_and_csv(columns, rows)
+            st.dataframe(df, use_container_width=True)
+
+            # 提供下载选项
+            st.download_button(
+                label=f"💾 Download {result.get('description')} as CSV",
+                data=csv_bytes,
+                file_name=f"query_result_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv",
+                key=f"download_result_{idx}"
+            )
+
 def connect_to_database():
     """测试数据库连接并获取表"""
     try:
-        db_service = DatabaseService(st.session_state.db_config)
+        db_service = get_db_service(st.session_state.db_config)
         if db_service.test_connection():
             st.session_state.connected = True
-            st.session_state.table_list = db_service.get_table_names()
+            st.session_state.table_list = _cached_table_names(json.dumps(st.session_state.db_config, sort_keys=True))
             st.success(f"✅ Connection successful! Found {len(st.session_state.table_list)} tables.")
         else:
             st.session_state.connected = False
@@ -81,7 +144,13 @@ with st.sidebar:
 
     if st.button("� Connect", use_container_width=True):
         connect_to_database()
-    
+
+    if st.button("🔄 Refresh schema", use_container_width=True):
+        _cached_table_names.clear()
+        _cached_schema_overview.clear()
+        if st.session_state.connected:
+            connect_to_database()
+
     # 连接状态显示
     if st.session_state.connected:
         st.success("🟢 数据库已连接")
@@ -133,10 +202,10 @@ if st.session_state.connected:
                 if st.button("🔍 获取表结构概览"):
                     with st.spinner("正在获取表结构信息..."):
                         try:
-                            # 获取表结构概览
-                            table_overview = get_table_overview(
-                                st.session_state.db_config,
-                                use_relationship_filter=use_relationship_filter
+                            # 获取表结构概览（带缓存）
+                            table_overview = _cached_schema_overview(
+                                json.dumps(st.session_state.db_config, sort_keys=True),
+                                use_relationship_filter
                             )
                             st.session_state.table_overview = table_overview
                             st.success("✅ 表结构概览获取成功")
@@ -186,7 +255,42 @@ if st.session_state.connected:
                                 progress_bar.progress(10)
                                 
                                 all_table_names = st.session_state.table_list
-                                relevant_tables = select_relevant_tables(all_table_names, question)
+                                cfg_key = json.dumps(st.session_state.db_config, sort_keys=True)
+
+                                # 快速通道：简短问题直接点名了唯一一个已选表时，
+                                # 跳过LLM表选择和问题精炼，省掉两次LLM往返
+                                matched_tables = [
+                                    t for t in st.session_state.selected_tables
+                                    if re.search(rf'\b{re.escape(t)}\b', question, re.I)
+                                ]
+                                fast_path = len(matched_tables) == 1 and len(question) < 80
+                                refine_future = None
+                                fused_result = None
+                                if fast_path:
+                                    relevant_tables = matched_tables
+                                    st.write("⚡ 快速通道：问题直接命中单个表，跳过LLM表选择")
+                                else:
+                                    selected_schema = _cached_simplified_schema(
+                                        cfg_key, frozenset(st.session_state.selected_tables)
+                                    )
+
+                                    # 融合规划：一次LLM调用同时完成问题精炼、选表和SQL计划生成，
+                                    # 把常规路径上的3次串行LLM往返压缩为1次
+                                    fused_result = fused_plan(st.session_state.db_config, selected_schema, question)
+                                    if fused_result is not None:
+                                        relevant_tables = [t for t in fused_result["relevant_tables"] if t in all_table_names]
+                                        st.write("⚡ 融合规划成功：单次LLM调用完成精炼+选表+SQL生成")
+                                    else:
+                                        # 回退到分步链路。问题精炼只依赖问题本身和已选表的结构，
+                                        # 与表选择互相独立，先行提交到线程池与表选择并行
+                                        refine_future = llm_batcher.submit_task(refine_user_prompt, selected_schema, question)
+
+                                        # 选表内部会先做本地embedding排序（毫秒级），
+                                        # 置信度不足时才回退到LLM
+                                        relevant_tables = select_relevant_tables(
+                                            all_table_names, question,
+                                            db_config=st.session_state.db_config
+                                        )
                                 
                                 if not relevant_tables:
                                     st.warning("⚠️ 未能自动识别出相关表，将使用所有选中的表。")
@@ -195,55 +299,82 @@ if st.session_state.connected:
                                 st.write(f"✅ 识别出 {len(relevant_tables)} 个相关表: {', '.join(relevant_tables)}")
                                 progress_bar.progress(20)
 
-                                # 2. 获取精简的表结构
+                                # 2. 获取精简的表结构（按配置+表集合缓存）
                                 status_text.text("📊 正在获取精简表结构...")
-                                simplified_schema = get_simplified_schemas_for_tables(
-                                    st.session_state.db_config,
-                                    relevant_tables
+                                if force_refresh:
+                                    _cached_simplified_schema.clear()
+                                simplified_schema = _cached_simplified_schema(
+                                    cfg_key,
+                                    frozenset(relevant_tables)
                                 )
                                 st.write("✅ 精简表结构获取完成")
                                 with st.expander("查看用于生成SQL的精简表结构"):
                                     st.code(simplified_schema, language='sql')
                                 progress_bar.progress(30)
 
-                                # 3. 问题精炼
-                                status_text.text(" refining question...")
-                                refined_prompt = refine_user_prompt(simplified_schema, question)
-                                st.write(f"🎯 精炼后的问题: {refined_prompt}")
+                                # 3. 问题精炼（快速通道直接使用原始问题；融合规划直接取计划内结果；
+                                #    否则取并行任务的结果）
+                                if fast_path:
+                                    refined_prompt = question
+                                elif fused_result is not None:
+                                    refined_prompt = fused_result["refined_prompt"]
+                                    st.write(f"🎯 精炼后的问题: {refined_prompt}")
+                                else:
+                                    status_text.text(" refining question...")
+                                    refined_prompt = refine_future.result()
+                                    st.write(f"🎯 精炼后的问题: {refined_prompt}")
                                 progress_bar.progress(40)
                                 
                                 # 4. 生成和验证SQL
                                 final_execution_plan = None
                                 last_error = None
-                                
+                                seen_invalid_signatures = set()
+
                                 for attempt in range(1, max_attempts + 1):
                                     st.write(f"🔄 第 {attempt}/{max_attempts} 轮 SQL生成...")
                                     status_text.text(f"⚙️ 正在生成SQL... (第{attempt}次尝试)")
                                     progress_bar.progress(40 + (attempt * 20))
                                     
-                                    # 生成SQL
-                                    execution_plan = generate_sql_with_dependencies(
-                                        st.session_state.db_config,
-                                        simplified_schema, # 使用精简后的schema
-                                        refined_prompt,
-                                        relevant_tables=relevant_tables,
-                                        last_error=last_error
-                                    )
+                                    # 生成SQL（融合规划已经带了执行计划，首轮直接复用）
+                                    if fused_result is not None and attempt == 1:
+                                        execution_plan = fused_result
+                                    else:
+                                        execution_plan = generate_sql_with_dependencies(
+                                            st.session_state.db_config,
+                                            simplified_schema, # 使用精简后的schema
+                                            refined_prompt,
+                                            relevant_tables=relevant_tables,
+                                            last_error=last_error
+                                        )
                                     
                                     if isinstance(execution_plan, str):
                                         st.error(f"❌ 生成失败: {execution_plan}")
                                         continue
-                                    
+
+                                    # 快速通道首次尝试跳过LLM验证，仅在执行出错后重试时才验证
+                                    if fast_path and attempt == 1:
+                                        st.write("⚡ 快速通道：跳过首次SQL验证")
+                                        final_execution_plan = execution_plan
+                                        break
+
                                     # 验证SQL
                                     sql_list = [step.get('sql', '') for step in execution_plan.get("execution_plan", [])]
                                     tables_used = execution_plan.get("tables_used", [])
-                                    
+
+                                    # 模型重新生成了与已判失败完全相同的SQL时，
+                                    # 再验证也只会得到同样的结论，提前结束重试
+                                    sql_signature = tuple(sql_list)
+                                    if sql_signature in seen_invalid_signatures:
+                                        st.warning("⚠️ 模型生成了与上次相同的SQL，提前结束重试")
+                                        break
+
                                     validation_result = validate_final_sql_result(
                                         simplified_schema, # 使用精简后的schema
                                         refined_prompt,
                                         sql_list,
                                         tables_used,
-                                        execution_plan=execution_plan
+                                        execution_plan=execution_plan,
+                                        db_config=st.session_state.db_config
                                     )
                                     
                                     if validation_result.get("is_valid", False):
@@ -252,6 +383,7 @@ if st.session_state.connected:
                                         break
                                     else:
                                         last_error = validation_result.get("reason", "未知原因")
+                                        seen_invalid_signatures.add(sql_signature)
                                         st.warning(f"⚠️ 验证失败: {last_error}")
                                 
                                 if not final_execution_plan:
@@ -264,7 +396,8 @@ if st.session_state.connected:
                                     st.write("🚀 开始执行SQL查询...")
                                     execution_results = execute_queries_and_format_with_dependencies(
                                         st.session_state.db_config,
-                                        final_execution_plan
+                                        final_execution_plan,
+                                        engine=get_db_service(st.session_state.db_config).get_engine()
                                     )
                                     
                                     progress_bar.progress(90)
@@ -279,41 +412,18 @@ if st.session_state.connected:
                                     
                                     progress_bar.progress(100)
                                     status_text.text("✅ 查询完成！")
-                                    
-                                    # 显示结果
-                                    st.markdown("---")
-                                    st.subheader("📊 查询结果")
-                                    
-                                    # 显示生成的SQL
-                                    with st.expander("🔍 查看生成的SQL", expanded=False):
-                                        if final_execution_plan:
-                                            for i, step in enumerate(final_execution_plan.get("execution_plan", [])):
-                                                st.write(f"**步骤 {i+1}: {step.get('description', 'N/A')}**")
-                                                st.code(step.get('sql', 'N/A'), language='sql')
-                                    
-                                    # 显示最终答案
-                                    st.markdown(final_answer)
-                                    
-                                    # 显示每个步骤的数据结果
-                                    for result in execution_results:
-                                        if result.get("raw_results"):
-                                            st.write(f"**{result.get('description')}**")
-                                            df = pd.DataFrame(result["raw_results"])
-                                            st.dataframe(df, use_container_width=True)
-                                            
-                                            # 提供下载选项
-                                            csv = df.to_csv(index=False)
-                                            st.download_button(
-                                                label=f"💾 Download {result.get('description')} as CSV",
-                                                data=csv,
-                                                file_name=f"query_result_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                                mime="text/csv"
-                                            )
-                                
+
+                                    # 结果存入session state，由下方的fragment渲染
+                                    st.session_state.query_results = (execution_results, final_answer, final_execution_plan)
+
                         except Exception as e:
                             st.error(f"❌ 查询过程中发生错误: {e}")
                 else:
                     st.warning("⚠️ 请输入查询问题")
+
+            # 渲染最近一次的查询结果（fragment独立rerun，下载等操作不会重跑整个页面）
+            if st.session_state.get('query_results'):
+                render_results(*st.session_state.query_results)
         else:
             st.info("👈 请先在左侧选择要查询的表")
 else:
@@ -2,7 +2,14 @@
 import os
 
 # LLM (Large Language Model) aiconfig
-LLM_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+# 模型分档：选表、问题精炼这类简单子任务走便宜/快的模型，
+# SQL生成与验证等核心任务继续使用默认模型
+LLM_MODELS = {
+    "default": "gemini-2.0-flash",
+    "cheap": "gemini-2.0-flash-lite",
+}
+LLM_API_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+LLM_API_URL = LLM_API_URL_TEMPLATE.format(model=LLM_MODELS["default"])
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "YOUR_API_KEY_HERE")
 
 # Database config
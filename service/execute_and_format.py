@@ -1,91 +1,214 @@
+import json
+import logging
 import re
+import threading
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Dict, Any, Tuple
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from .database_service import DatabaseService
 
-def execute_queries_and_format_with_dependencies(config: Dict[str, Any], execution_plan: Dict) -> List[Dict[str, Any]]:
+logger = logging.getLogger(__name__)
+
+# Matches {{param_name}} placeholders in SQL templates; compiled once at import.
+_PARAM_RE = re.compile(r'\{\{([^}]+)\}\}')
+
+# Upper bound on rows materialized per execution-plan step; protects memory
+# when an intermediate query returns a huge result set.
+MAX_ROWS_PER_STEP = 5000
+
+# SQL IN clauses degrade badly past roughly this many items on most engines.
+MAX_IN_CLAUSE = 1000
+
+# Number of independent execution-plan steps run concurrently.
+MAX_PARALLEL_STEPS = 4
+
+# Rows included in the JSON representation handed to the LLM.
+MAX_LLM_JSON_ROWS = 500
+
+# Above this row count, table formatting delegates width computation to
+# pandas (vectorized C loops); below it the plain-Python path is cheaper.
+PANDAS_FORMAT_THRESHOLD = 200
+
+def execute_queries_and_format_with_dependencies(config: Dict[str, Any], execution_plan: Dict, engine=None) -> List[Dict[str, Any]]:
     """
     Executes queries with dependencies and returns results, including raw data and formatted text.
     This version uses SQLAlchemy for database interaction, supporting multiple database types.
+    An already-created engine can be passed in to reuse its connection pool; otherwise
+    a DatabaseService is created from the config.
     """
-    try:
-        db_service = DatabaseService(config)
-        engine = db_service.get_engine()
-    except (FileNotFoundError, ValueError, ConnectionError) as e:
-        return [{"description": "Database Connection Error", "formatted_text": f"Error: {e}", "raw_results": [], "error": str(e)}]
-
-    with engine.connect() as connection:
-        step_results_for_deps = {}
-        output_results = []
-        
-        execution_steps = execution_plan.get("execution_plan", [])
-        
-        for step_info in execution_steps:
-            step_id = step_info["step"]
-            query_id = step_info["query_id"]
-            sql_template = step_info["sql"]
-            depends_on = step_info.get("depends_on", [])
-            description = step_info.get("description", f"Executing query {step_id}")
-
-            sql_query, params = _resolve_query_parameters(sql_template, step_results_for_deps, depends_on)
-
-            if sql_query is None:
-                error_msg = f"Step {step_id} ({description}): Execution failed because a dependent query returned no results."
-                output_results.append({"description": description, "formatted_text": error_msg, "raw_results": [], "error": "Dependency resolution failed"})
-                continue
-            
-            print(f"Executing SQL: {sql_query} with params: {params}")
-            
-            try:
-                result_proxy = connection.execute(text(sql_query), params)
-                
-                raw_results = [dict(row._mapping) for row in result_proxy]
-                step_results_for_deps[query_id] = raw_results
-                
-                if raw_results:
-                    formatted_text = _format_step_result(step_info, raw_results)
-                    output_results.append({
-                        "description": description,
-                        "formatted_text": formatted_text,
-                        "raw_results": raw_results
-                    })
-                else:
-                    msg = f"Step {step_id} ({description}): No matching data found"
-                    output_results.append({"description": description, "formatted_text": msg, "raw_results": []})
-                    
-            except SQLAlchemyError as e:
-                error_msg = f"Step {step_id} failed to execute: {e}\nSQL: {sql_query}"
-                output_results.append({"description": description, "formatted_text": error_msg, "raw_results": [], "error": str(e)})
+    if engine is None:
+        try:
+            db_service = DatabaseService(config)
+            engine = db_service.get_engine()
+        except (FileNotFoundError, ValueError, ConnectionError) as e:
+            return [{"description": "Database Connection Error", "formatted_text": f"Error: {e}", "raw_results": [], "error": str(e)}]
+
+    execution_steps = execution_plan.get("execution_plan", [])
+    step_results_for_deps = {}
+    results_lock = threading.Lock()
+    output_by_step = {}
+
+    # "Feeder" steps only exist to supply parameters to later steps; stream
+    # their results and keep just the columns the dependent parameters need.
+    feeder_query_ids = {dep for step in execution_steps for dep in step.get("depends_on", [])}
+    referenced_params = {name for step in execution_steps for name in _PARAM_RE.findall(step.get("sql", ""))}
+    needed_columns = _candidate_columns_for_params(referenced_params)
+
+    def run_step(step_info: Dict) -> None:
+        step_id = step_info["step"]
+        query_id = step_info["query_id"]
+        sql_template = step_info["sql"]
+        depends_on = step_info.get("depends_on", [])
+        description = step_info.get("description", f"Executing query {step_id}")
+
+        with results_lock:
+            statement, params = _resolve_query_parameters(sql_template, step_results_for_deps, depends_on)
+
+        if statement is None:
+            error_msg = f"Step {step_id} ({description}): Execution failed because a dependent query returned no results."
+            with results_lock:
+                output_by_step[step_id] = {"description": description, "formatted_text": error_msg, "raw_results": [], "error": "Dependency resolution failed"}
+            return
+
+        logger.debug("Executing SQL: %s with params: %s", statement.text, params)
+
+        is_feeder = query_id in feeder_query_ids
+
+        try:
+            # Each worker draws its own connection from the pool, so
+            # independent steps can run concurrently. begin() wraps the
+            # step in one explicit transaction instead of per-execute
+            # auto-begin/commit cycles.
+            with engine.begin() as connection:
+                if is_feeder:
+                    # Server-side cursor: feeder results can be large and are
+                    # only consumed as parameter inputs, so avoid buffering
+                    # them twice (driver + Python).
+                    connection = connection.execution_options(stream_results=True)
+                mapping_result = connection.execute(statement, params).mappings()
+
+                # RowMapping objects are dict-like views over the driver rows,
+                # skipping a per-row dict() build.
+                raw_results = mapping_result.fetchmany(MAX_ROWS_PER_STEP)
+                if len(raw_results) == MAX_ROWS_PER_STEP and mapping_result.fetchone() is not None:
+                    logger.warning("Step %s returned more than %s rows; result truncated.", step_id, MAX_ROWS_PER_STEP)
+
+            if raw_results:
+                formatted_text = _format_step_result(step_info, raw_results)
+                result = {"description": description, "formatted_text": formatted_text, "raw_results": raw_results}
+            else:
+                msg = f"Step {step_id} ({description}): No matching data found"
+                result = {"description": description, "formatted_text": msg, "raw_results": []}
+
+            dep_rows = raw_results
+            if is_feeder and raw_results and len(raw_results[0]) > 1:
+                # Keep only the columns that dependent parameters reference,
+                # so wide feeder results don't stay resident in full.
+                keep = needed_columns & raw_results[0].keys()
+                if keep:
+                    dep_rows = [{col: row[col] for col in keep} for row in raw_results]
+
+            with results_lock:
+                step_results_for_deps[query_id] = dep_rows
+                output_by_step[step_id] = result
+
+        except SQLAlchemyError as e:
+            error_msg = f"Step {step_id} failed to execute: {e}\nSQL: {statement.text}"
+            with results_lock:
+                output_by_step[step_id] = {"description": description, "formatted_text": error_msg, "raw_results": [], "error": str(e)}
+
+    # Schedule the steps as a DAG: a step becomes ready once every query_id
+    # it depends on has finished (successfully or not, matching the previous
+    # serial behavior where failed dependencies surface as resolution errors).
+    pending = list(execution_steps)
+    completed_query_ids = set()
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_STEPS) as executor:
+        futures = {}
+        while pending or futures:
+            ready = [s for s in pending if all(dep in completed_query_ids for dep in s.get("depends_on", []))]
+            for step_info in ready:
+                pending.remove(step_info)
+                futures[executor.submit(run_step, step_info)] = step_info
 
-        return output_results
+            if not futures:
+                # Remaining steps reference unknown query_ids; report and stop.
+                for step_info in pending:
+                    step_id = step_info["step"]
+                    description = step_info.get("description", f"Executing query {step_id}")
+                    error_msg = f"Step {step_id} ({description}): Unresolvable dependencies {step_info.get('depends_on', [])}"
+                    output_by_step[step_id] = {"description": description, "formatted_text": error_msg, "raw_results": [], "error": "Unresolvable dependencies"}
+                break
 
-def _resolve_query_parameters(sql_template: str, step_results: Dict, depends_on: List[str]) -> Tuple[str, Dict]:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                step_info = futures.pop(future)
+                completed_query_ids.add(step_info["query_id"])
+
+    return [output_by_step[step_id] for step_id in sorted(output_by_step)]
+
+def _candidate_columns_for_params(param_names) -> set:
+    """
+    Expands parameter names into the column names _extract_parameter_value
+    may look up for them (the name itself plus its singularized guesses).
+    """
+    columns = set()
+    for name in param_names:
+        columns.add(name)
+        if name.endswith('_ids'):
+            columns.add(name[:-4] + '_id')
+        elif name.endswith('s'):
+            columns.add(name[:-1])
+    return columns
+
+
+def _resolve_query_parameters(sql_template: str, step_results: Dict, depends_on: List[str]) -> Tuple[Any, Dict]:
     """
     Resolves parameter placeholders in the SQL template with actual query results
     using parameter binding to prevent SQL injection.
+
+    Returns a SQLAlchemy text() statement (with expanding bindparams for
+    list-valued parameters, so `IN (:param)` works across drivers) and the
+    parameter dict.
     """
     params = {}
-    parameter_pattern = r'\{\{([^}]+)\}\}'
-    
+    list_params = []
+
     def replacer(match):
         param_name = match.group(1)
         if param_name in params:
             return f":{param_name}"
 
         param_value = _extract_parameter_value(param_name, step_results, depends_on)
-        
+
         if param_value is None:
             raise ValueError(f"Could not resolve parameter: {param_name}")
-            
+
         params[param_name] = param_value
+        if isinstance(param_value, (tuple, list, set)):
+            list_params.append(param_name)
         return f":{param_name}"
 
     try:
-        sql_query = re.sub(parameter_pattern, replacer, sql_template)
-        return sql_query, params
+        sql_query = _PARAM_RE.sub(replacer, sql_template)
+        if list_params:
+            # Expanding bindparams render their own parentheses, so turn
+            # `IN (:ids)` (the form the LLM produces) into `IN :ids`.
+            for name in list_params:
+                sql_query = re.sub(rf'\(\s*:{name}\s*\)', f':{name}', sql_query)
+            statement = text(sql_query).bindparams(*[bindparam(name, expanding=True) for name in list_params])
+        else:
+            statement = text(sql_query)
+        return statement, params
     except ValueError as e:
-        print(f"Parameter resolution failed: {e}")
+        logger.warning("Parameter resolution failed: %s", e)
         return None, None
 
 def _extract_parameter_value(param_name: str, step_results: Dict, depends_on: List[str]) -> Any:
@@ -96,8 +219,11 @@ def _extract_parameter_value(param_name: str, step_results: Dict, depends_on: Li
     # Determine if the parameter is expected to be a list (e.g., for an IN clause)
     is_list_parameter = param_name.endswith(('_ids', '_id', 's'))
 
-    values = []
+    values = set()
     for dep_query_id in depends_on:
+        if len(values) > MAX_IN_CLAUSE:
+            logger.warning("Parameter '%s' exceeded %s values; truncating IN list.", param_name, MAX_IN_CLAUSE)
+            break
         if dep_query_id in step_results:
             dep_results = step_results[dep_query_id]
             if not dep_results:
@@ -110,18 +236,18 @@ def _extract_parameter_value(param_name: str, step_results: Dict, depends_on: Li
                         return row[param_name]
                     # Fallback for single-column results if no exact name match
                     if len(row) == 1:
-                        return list(row.values())[0]
+                        return next(iter(row.values()))
 
                 # For list parameters, aggregate values.
                 else:
                     # Case 1: Result has only one column. The most reliable scenario.
                     if len(row) == 1:
-                        values.append(list(row.values())[0])
+                        values.add(next(iter(row.values())))
                         continue
                     
                     # Case 2: An exact column name match exists.
                     if param_name in row:
-                        values.append(row[param_name])
+                        values.add(row[param_name])
                         continue
 
                     # Case 3: Try to guess the column name by singularizing the parameter.
@@ -133,41 +259,81 @@ def _extract_parameter_value(param_name: str, step_results: Dict, depends_on: Li
                         guess = guess[:-1] # products -> product
                     
                     if guess in row:
-                        values.append(row[guess])
+                        values.add(row[guess])
                         continue
     
     if is_list_parameter:
         if not values:
             # Return None if no values were found, allowing the caller to handle it.
             return None
-        # Use tuple for immutability, which is good practice for parameters.
-        # Using set() removes duplicates.
-        return tuple(set(values))
+        # Values were deduplicated during accumulation; tuple for immutability.
+        return tuple(values)
 
     # If a non-list parameter was not found, return None.
     return None
 
 
-def _format_step_result(step_info: Dict, raw_results: List[Dict]) -> str:
-    """格式化单个步骤的查询结果，并动态调整列宽。"""
+def _format_step_result(step_info: Dict, raw_results: List[Dict], format: str = "json") -> str:
+    """
+    格式化单个步骤的查询结果。
+
+    默认输出JSON（供LLM消费，省掉整个填充对齐的格式化过程，token也更省）；
+    format="table" 时输出带列宽对齐的人类可读表格。
+    """
     step_id = step_info["step"]
     description = step_info.get("description", f"查询步骤 {step_id}")
-    
+
     if not raw_results:
         return f"步骤 {step_id} ({description}): 未找到数据"
-    
+
+    if format == "json":
+        rows = [dict(row) for row in raw_results[:MAX_LLM_JSON_ROWS]]
+        if orjson is not None:
+            payload = orjson.dumps(rows, default=str).decode()
+        else:
+            payload = json.dumps(rows, ensure_ascii=False, default=str)
+        return f"步骤 {step_id} - {description}: (共 {len(raw_results)} 条记录)\n{payload}"
+
     columns = list(raw_results[0].keys())
     result_lines = [f"步骤 {step_id} - {description}: (共 {len(raw_results)} 条记录)"]
-    
+
+    if len(raw_results) > PANDAS_FORMAT_THRESHOLD:
+        try:
+            import pandas as pd
+
+            # 大结果集走pandas：str转换和列宽计算都在C层完成
+            df = pd.DataFrame([dict(row) for row in raw_results]).astype(str)
+            col_widths = [max(len(col), int(df[col].str.len().max())) for col in df.columns]
+            header = " | ".join(col.ljust(col_widths[i]) for i, col in enumerate(df.columns))
+            result_lines.append(header)
+            result_lines.append("-" * len(header))
+            for row_tuple in df.itertuples(index=False):
+                result_lines.append(" | ".join(value.ljust(col_widths[i]) for i, value in enumerate(row_tuple)))
+            return "\n".join(result_lines)
+        except Exception:
+            pass  # 回退到下面的纯Python路径
+
     try:
-        col_widths = {col: max(len(col), max((len(str(row.get(col, ''))) for row in raw_results), default=0)) for col in columns}
-        header = " | ".join([f"{col:{col_widths[col]}}" for col in columns])
+        # 单次遍历：每个单元格只str()一次，同时累计列宽，避免O(cols×rows)的重复扫描
+        # itemgetter在C层一次取出整行的值，省掉每个单元格一次.get()方法调用
+        if len(columns) == 1:
+            get_all = itemgetter(columns[0])
+            str_rows = [[str(get_all(row))] for row in raw_results]
+        else:
+            get_all = itemgetter(*columns)
+            str_rows = [[str(value) for value in get_all(row)] for row in raw_results]
+        col_widths = [len(col) for col in columns]
+        for str_row in str_rows:
+            for i, value in enumerate(str_row):
+                if len(value) > col_widths[i]:
+                    col_widths[i] = len(value)
+
+        header = " | ".join([col.ljust(col_widths[i]) for i, col in enumerate(columns)])
         result_lines.append(header)
         result_lines.append("-" * len(header))
-        
-        for row in raw_results:
-            row_data = " | ".join([f"{str(row.get(col, '')):<{col_widths[col]}}" for col in columns])
-            result_lines.append(row_data)
+
+        for str_row in str_rows:
+            result_lines.append(" | ".join([value.ljust(col_widths[i]) for i, value in enumerate(str_row)]))
     except Exception:
         # 如果格式化出错，回退到简单模式
         header = " | ".join(columns)
@@ -1,19 +1,52 @@
+import functools
+import hashlib
 import json
+import re
 from typing import List, Dict, Any, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+from . import json_utils
 from .llm_service import call_llm_api
+from .semantic_cache import SemanticCache
 from .prompt_templates import (
-    REFINE_USER_PROMPT_TEMPLATE,
-    TABLE_SELECTION_PROMPT_TEMPLATE,
-    SQL_GENERATION_WITH_DEPENDENCIES_PROMPT_TEMPLATE,
-    FINAL_SQL_VALIDATION_PROMPT_TEMPLATE,
-    SYNTHESIZE_ANSWER_PROMPT_TEMPLATE
+    FINAL_SQL_VALIDATION_PROMPT_STATIC_PREFIX,
+    SYNTHESIZE_ANSWER_PROMPT_STATIC_PREFIX,
+    render_refine_user_prompt,
+    render_table_selection_prompt,
+    render_fused_planner_prompt,
+    render_sql_generation_prefix,
+    render_sql_generation_suffix,
+    render_final_validation_suffix,
+    render_synthesize_answer_suffix
 )
 try:
-    from .generate_visualization import generate_chart_option
     from .get_table_schema import get_specific_table_schemas
+    from .sql_static_check import static_validate
 except ImportError:
-    from generate_visualization import generate_chart_option
     from get_table_schema import get_specific_table_schemas
+    from sql_static_check import static_validate
+
+
+# 常见的非SQLite函数到SQLite函数的映射（键统一为大写，便于不区分大小写查表）
+_SQLITE_TRANSLATIONS = {
+    "YEAR(CURDATE())": "strftime('%Y', 'now')",
+    "CURDATE()": "date('now')",
+    "NOW()": "datetime('now', 'localtime')",
+    "DATE_FORMAT(DATE_COLUMN, '%Y-%M')": "strftime('%Y-%m', date_column)",  # 示例
+}
+
+# 预编译为单个交替模式（长键在前，保证 YEAR(CURDATE()) 优先于 CURDATE()），
+# 每条SQL只扫描一遍，替代此前每个映射项各做一次re.sub的多遍扫描
+_SQLITE_RE = re.compile(
+    "|".join(re.escape(key) for key in sorted(_SQLITE_TRANSLATIONS, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+# 按方言分发；支持mysql等其他类型时在这里扩展 (方言 -> (编译后的模式, 转换表))
+_DIALECT_TRANSLATIONS = {
+    "sqlite": (_SQLITE_RE, _SQLITE_TRANSLATIONS),
+}
 
 
 def _translate_sql_for_dialect(sql_query: str, db_type: str) -> str:
@@ -27,28 +60,127 @@ def _translate_sql_for_dialect(sql_query: str, db_type: str) -> str:
     Returns:
         str: 转换后的SQL查询语句
     """
-    if db_type.lower() == 'sqlite':
-        # 定义常见的非SQLite函数到SQLite函数的映射
-        translations = {
-            "CURDATE()": "date('now')",
-            "NOW()": "datetime('now', 'localtime')",
-            "YEAR(CURDATE())": "strftime('%Y', 'now')",
-            "DATE_FORMAT(date_column, '%Y-%m')": "strftime('%Y-%m', date_column)", # 示例
-        }
-        
-        # 简单的字符串替换，对于更复杂的场景可能需要正则表达式
-        for non_sqlite_func, sqlite_func in translations.items():
-            # 使用不区分大小写的替换
-            import re
-            # 使用正则表达式以不区分大小写的方式替换，并保留原始大小写（如果可能）
-            # 这里简化处理，直接替换为小写版本
-            sql_query = re.sub(re.escape(non_sqlite_func), sqlite_func, sql_query, flags=re.IGNORECASE)
+    entry = _DIALECT_TRANSLATIONS.get(db_type.lower())
+    if entry is None:
+        return sql_query
+
+    pattern, translations = entry
+    return pattern.sub(lambda m: translations[m.group(0).upper()], sql_query)
+
+
+# 批量转换时拼接各步骤SQL用的分隔符（ASCII单元分隔符，正常SQL中不会出现）
+_SQL_BATCH_DELIMITER = "\x1f"
+
+
+def _translate_plan_sql_for_dialect(steps: List[Dict[str, Any]], db_type: str) -> None:
+    """
+    原地批量转换执行计划中所有步骤的SQL方言。
+
+    把所有SQL用分隔符拼成一个字符串后只做一次正则扫描再拆回，
+    K个步骤只需1次C层调用而不是K次。
+    """
+    entry = _DIALECT_TRANSLATIONS.get(db_type.lower())
+    if entry is None or not steps:
+        return
+
+    pattern, translations = entry
+    sqls = [step["sql"] for step in steps]
+    if any(_SQL_BATCH_DELIMITER in sql for sql in sqls):
+        # 分隔符意外出现在SQL里时，退回逐条转换以保证正确性
+        for step in steps:
+            step["sql"] = pattern.sub(lambda m: translations[m.group(0).upper()], step["sql"])
+        return
+
+    translated = pattern.sub(
+        lambda m: translations[m.group(0).upper()],
+        _SQL_BATCH_DELIMITER.join(sqls)
+    )
+    for step, new_sql in zip(steps, translated.split(_SQL_BATCH_DELIMITER)):
+        step["sql"] = new_sql
+
+
+# 语义缓存：重复或高度相似的问题直接复用之前的LLM结果，省掉一次网络往返
+_refine_cache = SemanticCache()
+_table_selection_cache = SemanticCache()
+
+
+def _dialect_guidance(db_type: str) -> str:
+    """生成提示词中关于SQL方言的指引文本。"""
+    db_type = db_type.lower()
+    if db_type == 'sqlite':
+        return "生成的SQL必须遵循 **SQLite** 语法。例如，获取当前年份应使用 `strftime('%Y', 'now')` 而不是 `YEAR(CURDATE())`。"
+    elif db_type == 'mysql':
+        return "生成的SQL必须遵循 **MySQL** 语法。例如，获取当前日期可使用 `CURDATE()`。"
+    return f"生成的SQL必须遵循 **{db_type}** 的语法。"
+
+
+class ExecutionStepModel(BaseModel):
+    """执行计划中的单个查询步骤，对应LLM返回JSON里的一项。"""
+    step: int
+    query_id: str
+    description: str
+    sql: str
+    depends_on: List[str]
+    output_params: List[str] = Field(default_factory=list)
+    table_used: str
+
 
-    # 如果是mysql或其他类型，可以添加相应的转换规则
-    # else if db_type.lower() == 'mysql':
-    #     ...
+class ExecutionPlanModel(BaseModel):
+    """LLM返回的完整执行计划结构。"""
+    execution_plan: List[ExecutionStepModel]
+    tables_used: List[str]
+    total_steps: int
+    has_dependencies: bool
 
-    return sql_query
+
+class FusedPlanModel(ExecutionPlanModel):
+    """融合规划的返回结构：在执行计划之上还包含精炼问题和相关表。"""
+    refined_prompt: str = Field(min_length=1)
+    relevant_tables: List[str]
+
+
+def _validate_execution_plan_structure(result_json: dict, model: type = ExecutionPlanModel) -> None:
+    """校验LLM返回的执行计划JSON结构，缺键或类型不符时抛出ValueError。
+
+    pydantic v2的校验在Rust层完成，比逐键的Python循环快得多，报错信息也更完整。
+    校验通过后仍沿用原始dict，后续步骤照常原地修改。
+    """
+    try:
+        model.model_validate(result_json)
+    except ValidationError as e:
+        raise ValueError(f"执行计划JSON结构校验失败: {e}") from e
+
+
+def _summarize_plan(execution_plan: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    单次遍历执行计划，生成依赖关系行（验证用）和查询说明行（合成回答用）。
+
+    结果缓存在计划dict自身的'_summary'键上，验证和合成两个阶段共享同一份。
+    """
+    cached = execution_plan.get("_summary")
+    if cached is not None:
+        return cached
+
+    steps = execution_plan.get("execution_plan", [])
+    summary = {
+        "dep_lines": [
+            f"Step {step['step']}: Depends on {', '.join(step['depends_on'])}"
+            if step.get('depends_on') else f"Step {step['step']}: Independent query"
+            for step in steps
+        ],
+        "query_lines": [
+            f"查询{i+1}: {step.get('description', '数据查询')}"
+            for i, step in enumerate(steps)
+        ],
+    }
+    execution_plan["_summary"] = summary
+    return summary
+
+
+@functools.lru_cache(maxsize=8)
+def _count_overview_tables(overview: str) -> int:
+    """统计概览文本中的表数量；按概览内容缓存，重试时不再重复扫描整个字符串。"""
+    return sum(1 for line in overview.splitlines() if line.lstrip().startswith('•'))
 
 
 def refine_user_prompt(detailed_schema, natural_language_prompt):
@@ -63,37 +195,67 @@ def refine_user_prompt(detailed_schema, natural_language_prompt):
     Returns:
         str: The refined, more specific question.
     """
-    prompt = REFINE_USER_PROMPT_TEMPLATE.format(
+    schema_hash = hashlib.md5(detailed_schema.encode('utf-8')).hexdigest()
+    cached = _refine_cache.get(natural_language_prompt, scope=schema_hash)
+    if cached is not None:
+        return cached
+
+    prompt = render_refine_user_prompt(
         detailed_schema=detailed_schema,
         natural_language_prompt=natural_language_prompt
     )
-    refined_question = call_llm_api(prompt)
+    # 问题精炼是简单子任务，路由到便宜的模型档位
+    refined_question = call_llm_api(prompt, model_tier="cheap")
+    if not refined_question.startswith("Error"):
+        _refine_cache.put(natural_language_prompt, refined_question, scope=schema_hash)
     return refined_question
 
 
-def select_relevant_tables(table_names: List[str], user_question: str) -> List[str]:
+def select_relevant_tables(table_names: List[str], user_question: str,
+                           db_config: Optional[Dict] = None) -> List[str]:
     """
-    Uses the LLM to select relevant tables from a list of table names based on the user's question.
-    
+    Selects the tables relevant to the user's question.
+
+    When `db_config` is given, a local embedding ranking runs first: if the
+    top tables clear the similarity threshold with a confident margin, they
+    are returned directly without any LLM call. Ambiguous rankings (and
+    callers without a db_config) fall back to the LLM-based selection.
+
     Args:
         table_names (List[str]): A list of all available table names.
         user_question (str): The user's natural language question.
-        
+        db_config (Optional[Dict]): Database config, enables the embedding pre-filter.
+
     Returns:
-        List[str]: A list of table names deemed relevant by the LLM.
+        List[str]: A list of relevant table names.
     """
-    prompt = TABLE_SELECTION_PROMPT_TEMPLATE.format(
+    if db_config is not None:
+        from .table_ranker import get_table_embeddings, rank_relevant_tables
+        ranked = rank_relevant_tables(user_question, get_table_embeddings(db_config))
+        ranked = [table for table in ranked if table in table_names]
+        if ranked:
+            return ranked
+
+    tables_hash = hashlib.md5(",".join(sorted(table_names)).encode('utf-8')).hexdigest()
+    cached = _table_selection_cache.get(user_question, scope=tables_hash)
+    if cached is not None:
+        return cached
+
+    prompt = render_table_selection_prompt(
         table_names=table_names,
         user_question=user_question
     )
-    
-    model_output = call_llm_api(prompt, is_json_output=True)
-    
+
+    # 选表是简单子任务，路由到便宜的模型档位
+    model_output = call_llm_api(prompt, is_json_output=True, model_tier="cheap")
+
     try:
-        result_json = json.loads(model_output)
+        result_json = json_utils.loads(model_output)
         if "relevant_tables" in result_json and isinstance(result_json["relevant_tables"], list):
             # Filter the results to ensure only valid table names are returned
             valid_tables = [table for table in result_json["relevant_tables"] if table in table_names]
+            if valid_tables:
+                _table_selection_cache.put(user_question, valid_tables, scope=tables_hash)
             return valid_tables
         else:
             print(f"Warning: LLM failed to return relevant tables in the expected format. Output: {model_output}")
@@ -102,6 +264,43 @@ def select_relevant_tables(table_names: List[str], user_question: str) -> List[s
         print(f"Warning: Error parsing relevant tables list: {e}. LLM Output: {model_output}")
         return []
 
+def fused_plan(db_config, table_overview, natural_language_prompt) -> Optional[Dict[str, Any]]:
+    """
+    单次LLM调用完成"精炼问题 + 选表 + 生成执行计划"三件事，
+    将常规路径上的3次串行LLM往返压缩为1次。
+
+    Args:
+        db_config (dict): 数据库连接配置
+        table_overview (str): 数据库中所有表的概览信息
+        natural_language_prompt (str): 用户的原始问题
+
+    Returns:
+        Optional[dict]: 含 refined_prompt / relevant_tables / execution_plan 等键的
+            完整计划；LLM输出不合法时返回None，由调用方回退到原有的分步链路。
+    """
+    db_type = db_config.get("database_type", "sqlite").lower()
+    prompt = render_fused_planner_prompt(
+        sql_dialect_guidance=_dialect_guidance(db_type),
+        table_overview=table_overview,
+        natural_language_prompt=natural_language_prompt
+    )
+
+    model_output = call_llm_api(prompt, is_json_output=True)
+
+    try:
+        result_json = json_utils.loads(model_output)
+
+        _validate_execution_plan_structure(result_json, model=FusedPlanModel)
+
+        _translate_plan_sql_for_dialect(result_json["execution_plan"], db_type)
+
+        return result_json
+
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"警告: 融合规划失败 ({e})，回退到分步链路。")
+        return None
+
+
 def generate_sql_with_dependencies(db_config, table_overview, refined_prompt, relevant_tables: List[str], last_error: Optional[str] = None):
     """
     生成具有依赖关系的SQL查询序列，支持查询间数据传递。
@@ -134,7 +333,7 @@ def generate_sql_with_dependencies(db_config, table_overview, refined_prompt, re
         }
     else:
         try:
-            total_tables = len([line for line in table_overview.split('\n') if line.strip().startswith('•')])
+            total_tables = _count_overview_tables(table_overview)
             optimization_ratio = f"{len(relevant_tables)}/{total_tables}" if total_tables > 0 else "100%"
             optimization_info = {
                 "tables_selected": relevant_tables,
@@ -156,12 +355,7 @@ def generate_sql_with_dependencies(db_config, table_overview, refined_prompt, re
     # 3. 使用详细的表结构来生成SQL
     # 根据数据库类型调整Prompt
     db_type = db_config.get("database_type", "sqlite").lower()
-    if db_type == 'sqlite':
-        sql_dialect_guidance = "生成的SQL必须遵循 **SQLite** 语法。例如，获取当前年份应使用 `strftime('%Y', 'now')` 而不是 `YEAR(CURDATE())`。"
-    elif db_type == 'mysql':
-        sql_dialect_guidance = "生成的SQL必须遵循 **MySQL** 语法。例如，获取当前日期可使用 `CURDATE()`。"
-    else:
-        sql_dialect_guidance = f"生成的SQL必须遵循 **{db_type}** 的语法。"
+    sql_dialect_guidance = _dialect_guidance(db_type)
 
     error_feedback_prompt = ""
     if last_error:
@@ -171,44 +365,33 @@ The SQL you generated last time failed validation for the following reason:
 Please analyze this error carefully and ensure it is completely corrected in this generation!
 """
 
-    prompt = SQL_GENERATION_WITH_DEPENDENCIES_PROMPT_TEMPLATE.format(
-        sql_dialect_guidance=sql_dialect_guidance,
-        error_feedback_prompt=error_feedback_prompt,
-        detailed_schema=detailed_schema,
-        refined_prompt=refined_prompt
+    # 静态指令（含方言指引，每种数据库恒定）在前，每次变化的内容在后，
+    # 使LLM服务商的前缀缓存可以命中
+    prompt = "{}\n{}".format(
+        render_sql_generation_prefix(sql_dialect_guidance=sql_dialect_guidance),
+        render_sql_generation_suffix(
+            detailed_schema=detailed_schema,
+            error_feedback_prompt=error_feedback_prompt,
+            refined_prompt=refined_prompt
+        )
     )
     
     model_output = call_llm_api(prompt, is_json_output=True)
     
     try:
-        result_json = json.loads(model_output)
-        
+        result_json = json_utils.loads(model_output)
+
         # 验证返回结果的结构
-        required_keys = ["execution_plan", "tables_used", "total_steps", "has_dependencies"]
-        for key in required_keys:
-            if key not in result_json:
-                raise ValueError(f"模型返回的JSON缺少 '{key}' 键。")
-        
-        # 验证execution_plan结构
-        if not isinstance(result_json["execution_plan"], list):
-            raise ValueError("execution_plan 必须是列表格式")
-            
-        for i, step in enumerate(result_json["execution_plan"]):
-            step_required_keys = ["step", "query_id", "description", "sql", "depends_on", "table_used"]
-            for key in step_required_keys:
-                if key not in step:
-                    raise ValueError(f"执行计划第{i+1}步缺少 '{key}' 键")
-            
-            # 在这里应用SQL方言转换
-            original_sql = step["sql"]
-            translated_sql = _translate_sql_for_dialect(original_sql, db_config.get("database_type", "sqlite"))
-            step["sql"] = translated_sql
-        
+        _validate_execution_plan_structure(result_json)
+
+        # 在这里应用SQL方言转换（整个计划批量做一次）
+        _translate_plan_sql_for_dialect(result_json["execution_plan"], db_config.get("database_type", "sqlite"))
+
         # 附加优化信息
         result_json["optimization_info"] = optimization_info
-        
+
         return result_json
-        
+
     except (json.JSONDecodeError, ValueError) as e:
         return f"错误：解析模型返回的JSON失败。模型原始输出: '{model_output}'. 错误详情: {e}"
 
@@ -249,10 +432,10 @@ def generate_sql_list(db_config, table_overview, refined_prompt, original_user_q
         return f"错误：转换执行计划格式失败: {e}"
 
 
-def validate_final_sql_result(table_schema, refined_prompt, sql_queries, tables_used, execution_plan=None):
+def validate_final_sql_result(table_schema, refined_prompt, sql_queries, tables_used, execution_plan=None, db_config=None):
     """
     验证最终SQL结果是否正确，支持依赖关系验证。
-    
+
     Args:
         table_schema (str): 数据库表结构信息
         refined_prompt (str): 精炼后的问题
@@ -260,10 +443,18 @@ def validate_final_sql_result(table_schema, refined_prompt, sql_queries, tables_
         sql_queries (list): 最终确定的SQL查询列表
         tables_used (list): 最终确定的表名列表
         execution_plan (dict): 执行计划信息（可选）
-        
+        db_config (dict): 数据库连接配置（可选）；提供时先做本地静态校验
+
     Returns:
         dict: 包含验证结果的字典
     """
+    # 先用数据库自身的解析器做静态校验：语法/表名/列名问题微秒级就能发现，
+    # 直接驳回并跳过LLM审查
+    if db_config is not None:
+        static_error = static_validate(sql_queries, db_config)
+        if static_error is not None:
+            return {"is_valid": False, "reason": static_error}
+
     # 格式化SQL查询和表名用于展示
     formatted_sql_queries = "\n".join([f"{i+1}. {sql}" for i, sql in enumerate(sql_queries)])
     formatted_tables = ", ".join(tables_used)
@@ -271,26 +462,23 @@ def validate_final_sql_result(table_schema, refined_prompt, sql_queries, tables_
     # 如果有执行计划，添加依赖关系信息
     dependency_info = ""
     if execution_plan and execution_plan.get("has_dependencies"):
-        dependency_info = "\n\n### Query Dependencies\n"
-        for step in execution_plan.get("execution_plan", []):
-            depends_on = step.get("depends_on", [])
-            if depends_on:
-                dependency_info += f"Step {step['step']}: Depends on {', '.join(depends_on)}\n"
-            else:
-                dependency_info += f"Step {step['step']}: Independent query\n"
-    
-    prompt = FINAL_SQL_VALIDATION_PROMPT_TEMPLATE.format(
-        table_schema=table_schema,
-        refined_prompt=refined_prompt,
-        formatted_tables=formatted_tables,
-        formatted_sql_queries=formatted_sql_queries,
-        dependency_info=dependency_info if dependency_info else "无依赖关系"
+        dependency_info = "\n\n### Query Dependencies\n" + "\n".join(_summarize_plan(execution_plan)["dep_lines"]) + "\n"
+
+    prompt = "{}\n{}".format(
+        FINAL_SQL_VALIDATION_PROMPT_STATIC_PREFIX,
+        render_final_validation_suffix(
+            table_schema=table_schema,
+            refined_prompt=refined_prompt,
+            formatted_tables=formatted_tables,
+            formatted_sql_queries=formatted_sql_queries,
+            dependency_info=dependency_info if dependency_info else "无依赖关系"
+        )
     )
     
     validation_result = call_llm_api(prompt, is_json_output=True)
     
     try:
-        result_json = json.loads(validation_result)
+        result_json = json_utils.loads(validation_result)
         
         # 验证返回结果的结构
         if "is_valid" not in result_json:
@@ -305,40 +493,52 @@ def validate_final_sql_result(table_schema, refined_prompt, sql_queries, tables_
         }
 
 
-def synthesize_answer(user_question, execution_results: List[Dict[str, Any]], execution_plan=None):
+def synthesize_answer(user_question, execution_results: List[Dict[str, Any]], execution_plan=None, enable_chart=True):
     """
     根据多份数据结果，并结合自动生成的图表，合成对用户问题的自然语言回答。
-    
+
     Args:
         user_question (str): 用户的原始问题
         execution_results (list): 包含每一步的描述、格式化文本和原始数据的字典列表
         execution_plan (dict): 执行计划信息（可选）
-        
+        enable_chart (bool): 是否尝试生成图表；调用方不展示图表时传False，
+            可省掉一次图表配置的LLM往返
+
     Returns:
         str: 对用户问题的自然语言回答，可能包含一个用于前端渲染的图表JSON代码块。
     """
     # 1. 提取所有格式化后的文本结果，用于构建给大模型的上下文
-    formatted_data = "\n\n".join([res.get("formatted_text", "") for res in execution_results if res.get("formatted_text")])
-    
+    # 生成器表达式直接喂给join，避免先物化一份中间列表
+    formatted_data = "\n\n".join(
+        res["formatted_text"] for res in execution_results if res.get("formatted_text")
+    )
+
     # 2. 从执行结果中提取最适合可视化的原始数据（通常是最后一个有数据的步骤）
     data_for_visualization = None
-    for result in reversed(execution_results):
-        if result.get("raw_results"):
-            data_for_visualization = result.get("raw_results")
-            break
+    if enable_chart:
+        for result in reversed(execution_results):
+            if result.get("raw_results"):
+                data_for_visualization = result.get("raw_results")
+                break
 
-    # 3. 调用可视化模块，尝试生成图表配置
+    # 3. 调用可视化模块，尝试生成图表配置。
+    #    行数太少或完全没有数值列时图表没有意义，直接跳过，
+    #    既省一次LLM往返，也避免无谓地加载可视化模块
     chart_option = None
-    if data_for_visualization is not None:
-        chart_option = generate_chart_option(data_for_visualization, user_question)
+    if data_for_visualization is not None and len(data_for_visualization) >= 3:
+        has_numeric_column = any(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for row in data_for_visualization[:5] for value in row.values()
+        )
+        if has_numeric_column:
+            from .generate_visualization import generate_chart_option
+            chart_option = generate_chart_option(data_for_visualization, user_question)
 
     # 4. 构建查询说明和给大模型的提示
     query_explanations = ""
     if execution_plan and "execution_plan" in execution_plan:
-        query_explanations = "\n\n### 查询说明\n"
-        for i, step in enumerate(execution_plan["execution_plan"]):
-            query_explanations += f"查询{i+1}: {step.get('description', '数据查询')}\n"
-    
+        query_explanations = "\n\n### 查询说明\n" + "\n".join(_summarize_plan(execution_plan)["query_lines"]) + "\n"
+
     chart_info_for_llm = ""
     if chart_option:
         chart_type = chart_option.get("series", [{}])[0].get("type", "chart")
@@ -349,11 +549,14 @@ def synthesize_answer(user_question, execution_results: List[Dict[str, Any]], ex
             f"Please interpret the data in your response and naturally guide the user to view this chart."
         )
 
-    prompt = SYNTHESIZE_ANSWER_PROMPT_TEMPLATE.format(
-        user_question=user_question,
-        query_explanations=query_explanations,
-        formatted_data=formatted_data,
-        chart_info_for_llm=chart_info_for_llm if chart_info_for_llm else "如果系统生成了图表，请自然地引导用户查看图表以获得更直观的感受。"
+    prompt = "{}\n{}".format(
+        SYNTHESIZE_ANSWER_PROMPT_STATIC_PREFIX,
+        render_synthesize_answer_suffix(
+            user_question=user_question,
+            query_explanations=query_explanations,
+            formatted_data=formatted_data,
+            chart_info_for_llm=chart_info_for_llm
+        )
     )
     # 5. 调用大模型生成文本部分的回答
     final_answer_text = call_llm_api(prompt)
@@ -361,7 +564,8 @@ def synthesize_answer(user_question, execution_results: List[Dict[str, Any]], ex
     # 6. 将文本回答和图表JSON代码块组合成最终输出
     if chart_option:
         # 按照前端约定的格式，将图表配置包裹在带有'chart'键的json代码块中
-        chart_json_block = f"```json\n{{ \"chart\": {json.dumps(chart_option, ensure_ascii=False, indent=2)} }}\n```"
+        # 优先用orjson做美化输出，大图表配置下序列化明显更快
+        chart_json_block = f"```json\n{{ \"chart\": {json_utils.dumps_pretty(chart_option)} }}\n```"
         final_answer = f"{final_answer_text}\n\n{chart_json_block}"
     else:
         final_answer = final_answer_text
@@ -1,24 +1,86 @@
 # service/generate_visualization.py
 import json
 from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+from . import json_utils
 from .llm_service import call_llm_api
 
 # --- Chart generation components ---
 
+# 用户问题中出现这些关键词时，倾向于展示"构成/占比"类的饼图
+_SHARE_KEYWORDS = ("占比", "构成", "分布", "share", "percentage")
+
+
+def _rule_based_chart_choice(col_types: Dict[str, str], data_results: List[Dict[str, Any]],
+                             user_question: str) -> Optional[Dict[str, str]]:
+    """
+    基于列类型和数据形状的确定性图表选择。
+
+    数据形状明确时（如恰好一个时间列+一个数值列），无需LLM就能确定图表类型，
+    直接返回与LLM相同结构的配置；形态不明确时返回None，交给LLM决策。
+    """
+    temporal_cols = [col for col, t in col_types.items() if t == 'temporal']
+    numerical_cols = [col for col, t in col_types.items() if t == 'numerical']
+    categorical_cols = [col for col, t in col_types.items() if t == 'categorical']
+
+    # 一个时间列 + 一个数值列 -> 趋势，折线图
+    if len(temporal_cols) == 1 and len(numerical_cols) == 1:
+        return {
+            "chart_type": "line",
+            "title": f"{numerical_cols[0]} 随 {temporal_cols[0]} 的变化趋势",
+            "x_axis_column": temporal_cols[0],
+            "y_axis_column": numerical_cols[0],
+        }
+
+    # 一个类别列 + 一个数值列 -> 比较（柱状图）或占比（饼图）
+    if len(categorical_cols) == 1 and len(numerical_cols) == 1 and not temporal_cols:
+        cat_col, num_col = categorical_cols[0], numerical_cols[0]
+        question_lower = user_question.lower()
+        wants_share = any(kw in question_lower for kw in _SHARE_KEYWORDS)
+        if wants_share and len(data_results) <= 8:
+            # 饼图要求各项数值非负，否则占比无意义
+            values_valid = all(
+                isinstance(row.get(num_col), (int, float)) and row[num_col] >= 0
+                for row in data_results
+            )
+            if values_valid:
+                return {
+                    "chart_type": "pie",
+                    "title": f"各{cat_col}的{num_col}占比",
+                    "x_axis_column": cat_col,
+                    "y_axis_column": num_col,
+                }
+        return {
+            "chart_type": "bar",
+            "title": f"各{cat_col}的{num_col}对比",
+            "x_axis_column": cat_col,
+            "y_axis_column": num_col,
+        }
+
+    # 多维/多指标等模糊形态，交给LLM判断
+    return None
+
+
 def _infer_column_types(data: List[Dict[str, Any]]) -> Dict[str, str]:
-    """从数据中推断列的类型（数值型、类别型、时间型）。"""
+    """从数据中推断列的类型（数值型、类别型、时间型）。
+
+    基于整列的dtype判断，而非只看第一行——首行为None时也能得到正确结果。
+    """
     if not data:
         return {}
-    
+
+    df = pd.DataFrame(data)
     types = {}
-    sample_row = data[0]
-    for col, value in sample_row.items():
+    for col in df.columns:
+        col_lower = col.lower()
         # 优先识别时间/日期相关字段
-        if 'date' in col.lower() or 'time' in col.lower():
+        if pd.api.types.is_datetime64_any_dtype(df[col]) or 'date' in col_lower or 'time' in col_lower:
             types[col] = 'temporal'
-        elif isinstance(value, (int, float)) and 'id' not in col.lower():
+        elif pd.api.types.is_numeric_dtype(df[col]) and 'id' not in col_lower:
             types[col] = 'numerical'
-        elif isinstance(value, str) or 'id' in col.lower():
+        elif pd.api.types.is_string_dtype(df[col]) or pd.api.types.is_object_dtype(df[col]) or 'id' in col_lower:
             types[col] = 'categorical'
         else:
             types[col] = 'other'
@@ -26,18 +88,19 @@ def _infer_column_types(data: List[Dict[str, Any]]) -> Dict[str, str]:
 
 def _create_bar_chart_option(data: List[Dict[str, Any]], cat_col: str, num_col: str, title: str) -> Dict[str, Any]:
     """生成ECharts柱状图的配置。"""
+    df = pd.DataFrame(data)
     try:
-        sorted_data = sorted(data, key=lambda x: x[num_col], reverse=True)
+        # nlargest一步完成排序+截断，大结果集下比Python层sorted快得多
+        top = df.nlargest(15, num_col)
     except (TypeError, ValueError):
-        sorted_data = data
+        top = df.head(15)
 
-    if len(sorted_data) > 15:
-        sorted_data = sorted_data[:15]
+    if len(df) > 15:
         title += " (Top 15)"
 
-    categories = [row[cat_col] for row in sorted_data]
-    values = [row[num_col] for row in sorted_data]
-    
+    categories = top[cat_col].tolist()
+    values = top[num_col].tolist()
+
     return {
         "title": {"text": title, "left": "center"},
         "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
@@ -53,9 +116,16 @@ def _create_bar_chart_option(data: List[Dict[str, Any]], cat_col: str, num_col:
 
 def _create_line_chart_option(data: List[Dict[str, Any]], cat_col: str, num_col: str, title: str) -> Dict[str, Any]:
     """生成ECharts折线图的配置。"""
-    categories = [row[cat_col] for row in data]
-    values = [row[num_col] for row in data]
-    
+    df = pd.DataFrame(data)
+    try:
+        # 折线图沿x轴（通常是时间）升序展示
+        df = df.sort_values(cat_col)
+    except (TypeError, ValueError):
+        pass
+
+    categories = df[cat_col].tolist()
+    values = df[num_col].tolist()
+
     return {
         "title": {"text": title, "left": "center"},
         "tooltip": {"trigger": "axis"},
@@ -100,6 +170,21 @@ def generate_chart_option(data_results: List[Dict[str, Any]], user_question: str
         return None
 
     col_types = _infer_column_types(data_results)
+
+    # 规则快路径：数据形状明确时直接用代码决策，省掉一次LLM往返
+    rule_choice = _rule_based_chart_choice(col_types, data_results, user_question)
+    if rule_choice is not None:
+        chart_type = rule_choice["chart_type"]
+        cat_col = rule_choice["x_axis_column"]
+        num_col = rule_choice["y_axis_column"]
+        title = rule_choice["title"]
+        if chart_type == 'line':
+            return _create_line_chart_option(data_results, cat_col, num_col, title)
+        elif chart_type == 'pie':
+            return _create_pie_chart_option(data_results, cat_col, num_col, title)
+        else:
+            return _create_bar_chart_option(data_results, cat_col, num_col, title)
+
     data_sample = data_results[:5] # 只取前5行作为样本
 
     prompt = f"""### 角色
@@ -124,10 +209,10 @@ def generate_chart_option(data_results: List[Dict[str, Any]], user_question: str
 {user_question}
 
 #### 2. 数据列名与推断类型
-{json.dumps(col_types, indent=2, ensure_ascii=False)}
+{json_utils.dumps_pretty(col_types)}
 
 #### 3. 数据样本 (前5行)
-{json.dumps(data_sample, indent=2, ensure_ascii=False)}
+{json_utils.dumps_pretty(data_sample)}
 
 ### 输出要求
 你必须返回一个JSON对象，包含以下字段：
@@ -153,7 +238,7 @@ def generate_chart_option(data_results: List[Dict[str, Any]], user_question: str
     llm_output = call_llm_api(prompt, is_json_output=True)
     
     try:
-        chart_config = json.loads(llm_output)
+        chart_config = json_utils.loads(llm_output)
         chart_type = chart_config.get("chart_type")
         title = chart_config.get("title", user_question)
         cat_col = chart_config.get("x_axis_column")
@@ -1,31 +1,77 @@
 import os
 import json
+import functools
 import hashlib
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from sqlalchemy import inspect
-from sqlalchemy.exc import SQLAlchemyError
-from .database_service import DatabaseService
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from . import json_utils
+
+@functools.lru_cache(maxsize=8)
+def _get_engine_and_inspector(config_json: str):
+    """按配置缓存engine和inspector。
+
+    inspect()在部分方言上会立刻发起网络往返，重复构建engine还会反复
+    建立连接池；同一进程内按配置复用一份即可。
+    """
+    # sqlalchemy导入开销在百毫秒级；缓存命中时的读路径根本不需要它，
+    # 推迟到第一次真正反射数据库时再导入
+    from sqlalchemy import inspect
+    from .database_service import DatabaseService
+
+    db_config = json.loads(config_json)
+    engine = DatabaseService(db_config).get_engine()
+    return engine, inspect(engine)
+
+
+def _engine_and_inspector(db_config: Dict):
+    """Returns the memoized (engine, inspector) pair for this config."""
+    return _get_engine_and_inspector(json.dumps(db_config, sort_keys=True))
+
+
+# 缓存目录在导入时建好一次，读路径上不再反复makedirs（每次都是一组stat系统调用）
+_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'cache')
+os.makedirs(_CACHE_DIR, exist_ok=True)
+
+@functools.lru_cache(maxsize=16)
+def _fingerprint_for_items(config_items: tuple) -> str:
+    config_str = json.dumps(dict(config_items), sort_keys=True)
+    # blake2b比md5快，且缓存键本就不需要md5的(已失效的)密码学属性
+    return hashlib.blake2b(config_str.encode(), digest_size=16).hexdigest()
 
 def get_database_fingerprint(db_config: Dict) -> str:
     """Generates a fingerprint for the database configuration."""
-    config_str = json.dumps(db_config, sort_keys=True)
-    return hashlib.md5(config_str.encode()).hexdigest()
+    try:
+        return _fingerprint_for_items(tuple(sorted(db_config.items())))
+    except TypeError:
+        # 配置里含不可哈希的嵌套结构时走无缓存的慢路径
+        config_str = json.dumps(db_config, sort_keys=True)
+        return hashlib.blake2b(config_str.encode(), digest_size=16).hexdigest()
+
+@functools.lru_cache(maxsize=16)
+def _cache_path_for(fingerprint: str) -> str:
+    return os.path.join(_CACHE_DIR, f"schema_cache_{fingerprint}.json")
 
 def get_cache_file_path(db_config: Dict) -> str:
     """Gets the cache file path based on the database configuration."""
-    script_dir = os.path.dirname(__file__)
-    cache_dir = os.path.join(script_dir, '..', 'cache')
-    os.makedirs(cache_dir, exist_ok=True)
-    fingerprint = get_database_fingerprint(db_config)
-    return os.path.join(cache_dir, f"schema_cache_{fingerprint}.json")
+    return _cache_path_for(get_database_fingerprint(db_config))
+
+@functools.lru_cache(maxsize=8)
+def _load_cache_at(cache_file_path: str, mtime_ns: int) -> Dict:
+    """按(路径, mtime)读取并解析缓存文件；文件未变动时命中内存，免去重复IO和JSON解析。"""
+    with open(cache_file_path, 'rb') as f:
+        return json_utils.loads(f.read())
 
 def load_cache(cache_file_path: str) -> Optional[Dict]:
     """Loads schema information from a cache file."""
     try:
-        if os.path.exists(cache_file_path):
-            with open(cache_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        mtime_ns = os.stat(cache_file_path).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        return _load_cache_at(cache_file_path, mtime_ns)
     except (IOError, json.JSONDecodeError) as e:
         print(f"Cache load failed: {e}")
     return None
@@ -33,34 +79,212 @@ def load_cache(cache_file_path: str) -> Optional[Dict]:
 def save_cache(cache_file_path: str, schema_data: Dict) -> None:
     """Saves schema information to a cache file."""
     try:
-        with open(cache_file_path, 'w', encoding='utf-8') as f:
-            json.dump(schema_data, f, ensure_ascii=False, indent=2)
+        # 先写同目录临时文件再os.replace原子换入：进程中途崩溃不会留下
+        # 半截JSON，并发读者要么看到旧版要么看到新版，不会读到写一半的文件
+        tmp_path = f"{cache_file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json_utils.dumps_pretty(schema_data))
+        os.replace(tmp_path, cache_file_path)
+        _write_sidecar(cache_file_path, schema_data)
+        _write_bloom(cache_file_path, schema_data)
+        # 缓存文件内容变了，内存里的记忆化结果随之失效
+        invalidate_schema_memo()
     except IOError as e:
         print(f"Cache save failed: {e}")
 
+# --- SQLite行存侧录 ---
+# JSON缓存仍是权威数据；同时写一份SQLite行存，按表子集取结构时
+# 只SELECT所需的k行，不必把整个schema图加载进内存再过滤。
+
+def _sidecar_db_path(cache_file_path: str) -> str:
+    """Returns the path of the SQLite sidecar next to a JSON cache file."""
+    return cache_file_path.rsplit('.json', 1)[0] + '.sqlite'
+
+def _write_sidecar(cache_file_path: str, schema_data: Dict) -> None:
+    """Mirrors the schema cache into a SQLite row store for subset queries."""
+    db_path = _sidecar_db_path(cache_file_path)
+    try:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("DROP TABLE IF EXISTS tables")
+            conn.execute("DROP TABLE IF EXISTS relationships")
+            conn.execute(
+                "CREATE TABLE tables (name TEXT PRIMARY KEY, create_sql TEXT, "
+                "columns_json TEXT, columns_str TEXT, column_count INTEGER)"
+            )
+            conn.execute(
+                "CREATE TABLE relationships (from_table TEXT, to_table TEXT, description TEXT)"
+            )
+            conn.executemany(
+                "INSERT INTO tables VALUES (?, ?, ?, ?, ?)",
+                [
+                    (name, data["create_sql"], json_utils.dumps(data["columns"]),
+                     data.get("columns_str", ""), data["column_count"])
+                    for name, data in schema_data.get("tables", {}).items()
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO relationships VALUES (?, ?, ?)",
+                [
+                    (rel["from_table"], rel["to_table"], rel["description"])
+                    for rel in schema_data.get("relationships", [])
+                ]
+            )
+    except sqlite3.Error as e:
+        print(f"Sidecar cache write failed: {e}")
+
+def _sidecar_fetch(cache_file_path: str, table_names: List[str]):
+    """
+    Fetches only the requested tables (and their relationships) from the sidecar.
+
+    Returns (tables_dict, relationships) or None when the sidecar is missing
+    or older than the JSON cache — callers then fall back to the JSON path.
+    """
+    db_path = _sidecar_db_path(cache_file_path)
+    try:
+        if os.stat(db_path).st_mtime < os.stat(cache_file_path).st_mtime:
+            return None
+    except OSError:
+        return None
+
+    placeholders = ", ".join("?" * len(table_names))
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+            table_rows = conn.execute(
+                f"SELECT name, create_sql, columns_json, columns_str FROM tables WHERE name IN ({placeholders})",
+                table_names
+            ).fetchall()
+            rel_rows = conn.execute(
+                f"SELECT from_table, to_table, description FROM relationships "
+                f"WHERE from_table IN ({placeholders}) OR to_table IN ({placeholders})",
+                table_names + table_names
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Sidecar cache read failed: {e}")
+        return None
+
+    tables = {
+        name: {"create_sql": create_sql, "columns": json_utils.loads(columns_json),
+               "columns_str": columns_str}
+        for name, create_sql, columns_json, columns_str in table_rows
+    }
+    relationships = [
+        {"from_table": from_table, "to_table": to_table, "description": description}
+        for from_table, to_table, description in rel_rows
+    ]
+    return tables, relationships
+
+# --- 布隆过滤器 ---
+# 按表子集取结构时，调用方传入的表名可能大量不在缓存里（LLM幻觉表名、
+# 用户输入等）；先用几字节的布隆过滤器O(1)拒掉非成员，再去碰大字典/侧录。
+
+# 误判率约0.1%：每个元素约14.4位、10个哈希位置
+_BLOOM_BITS_PER_ITEM = 15
+_BLOOM_NUM_HASHES = 10
+
+class _BloomFilter:
+    """很小的布隆过滤器：blake2b派生出双哈希，组合成k个位位置。"""
+
+    def __init__(self, num_bits: int, bits: Optional[bytes] = None):
+        self.num_bits = num_bits
+        self.bits = bytearray(bits) if bits is not None else bytearray((num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(_BLOOM_NUM_HASHES):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+def _bloom_path(cache_file_path: str) -> str:
+    return cache_file_path.rsplit('.json', 1)[0] + '.bloom'
+
+def _write_bloom(cache_file_path: str, schema_data: Dict) -> None:
+    """Writes a Bloom filter over the cached table names next to the JSON cache."""
+    table_names = schema_data.get("tables", {})
+    num_bits = max(len(table_names), 1) * _BLOOM_BITS_PER_ITEM
+    bloom = _BloomFilter(num_bits)
+    for name in table_names:
+        bloom.add(name)
+    try:
+        with open(_bloom_path(cache_file_path), 'wb') as f:
+            f.write(num_bits.to_bytes(4, 'big'))
+            f.write(bloom.bits)
+    except IOError as e:
+        print(f"Bloom filter write failed: {e}")
+
+@functools.lru_cache(maxsize=8)
+def _load_bloom_at(bloom_path: str, mtime_ns: int) -> _BloomFilter:
+    with open(bloom_path, 'rb') as f:
+        raw = f.read()
+    return _BloomFilter(int.from_bytes(raw[:4], 'big'), raw[4:])
+
+def _load_bloom(cache_file_path: str) -> Optional[_BloomFilter]:
+    """Returns the Bloom filter for this cache, or None when absent/unreadable."""
+    bloom_path = _bloom_path(cache_file_path)
+    try:
+        mtime_ns = os.stat(bloom_path).st_mtime_ns
+        return _load_bloom_at(bloom_path, mtime_ns)
+    except (OSError, IOError):
+        return None
+
+def _filter_known_tables(cache_file_path: str, table_names: List[str]) -> List[str]:
+    """Drops names the Bloom filter proves absent from the cache (no false negatives)."""
+    bloom = _load_bloom(cache_file_path)
+    if bloom is None:
+        return table_names
+    return [name for name in table_names if name in bloom]
+
 def is_cache_valid(cache_file_path: str, max_age_hours: int = 24) -> bool:
     """Checks if the cache is valid based on its age."""
-    cached_data = load_cache(cache_file_path)
-    if not cached_data or 'timestamp' not in cached_data:
-        return False
-    
+    # 只看文件mtime，不为判新鲜度解析整份JSON；save_cache的原子写保证
+    # mtime就是缓存内容的生成时间
     try:
-        timestamp = datetime.fromisoformat(cached_data['timestamp'])
-        return datetime.now() - timestamp < timedelta(hours=max_age_hours)
-    except (ValueError, TypeError):
+        mtime = os.path.getmtime(cache_file_path)
+    except OSError:
         return False
+    return time.time() - mtime < max_age_hours * 3600
 
 def extract_database_info(db_config: Dict) -> Dict[str, Any]:
     """Extracts detailed information from the database."""
+    from sqlalchemy.exc import SQLAlchemyError
+
     try:
-        db_service = DatabaseService(db_config)
-        engine = db_service.get_engine()
-        inspector = inspect(engine)
+        engine, inspector = _engine_and_inspector(db_config)
         table_names = inspector.get_table_names()
         
         if not table_names:
             raise ValueError("No tables found in the database.")
 
+        # 批量反射：SQLAlchemy 2.0的multi API一次性取回所有表的列和外键，
+        # 把逐表调用的N+1次数据库往返压缩成常数次
+        try:
+            columns_by_table = {
+                key[1]: cols
+                for key, cols in inspector.get_multi_columns(filter_names=table_names).items()
+            }
+            fks_by_table = {
+                key[1]: fks
+                for key, fks in inspector.get_multi_foreign_keys(filter_names=table_names).items()
+            }
+        except NotImplementedError:
+            # 个别方言不支持批量反射，退回逐表调用。
+            # 网络型数据库的逐表调用阻塞在socket读上（期间释放GIL），
+            # 线程池扇出可近线性加速；SQLite是本地文件访问，保持串行
+            if engine.dialect.name == 'sqlite':
+                columns_by_table = {name: inspector.get_columns(name) for name in table_names}
+                fks_by_table = {name: inspector.get_foreign_keys(name) for name in table_names}
+            else:
+                with ThreadPoolExecutor(max_workers=16) as executor:
+                    columns_by_table = dict(zip(table_names, executor.map(inspector.get_columns, table_names)))
+                    fks_by_table = dict(zip(table_names, executor.map(inspector.get_foreign_keys, table_names)))
+
         cache_data = {
             "timestamp": datetime.now().isoformat(),
             "database_config": db_config,
@@ -70,23 +294,45 @@ def extract_database_info(db_config: Dict) -> Dict[str, Any]:
         }
 
         for table_name in table_names:
-            columns = inspector.get_columns(table_name)
-            
-            column_definitions = [f"  `{col['name']}` {col['type']}" for col in columns]
-            create_table_sql = "CREATE TABLE `{}` (\n{}\n);".format(table_name, ',\n'.join(column_definitions))
-            
-            column_info = [{
-                "name": col['name'], "type": str(col['type']),
-                "nullable": col.get('nullable', True),
-                "default": str(col.get('default')) if col.get('default') is not None else None
-            } for col in columns]
-            
+            columns = columns_by_table.get(table_name, [])
+
+            # 单趟遍历：每列的类型只str()一次、default只取一次，
+            # 同时喂给建表语句、列信息和列描述字符串三个视图。
+            # 建表语句直接累积进一个片段缓冲、最后一次join成串，
+            # 不再经过"列定义列表 -> join -> format"的三重中间字符串
+            sql_buf = ["CREATE TABLE `", table_name, "` (\n"]
+            column_info = []
+            columns_str_parts = []
+            col_names = []
+            for i, col in enumerate(columns):
+                name = col['name']
+                type_str = str(col['type'])
+                default = col.get('default')
+                col_names.append(name)
+                if i:
+                    sql_buf.append(",\n")
+                sql_buf.append("  `")
+                sql_buf.append(name)
+                sql_buf.append("` ")
+                sql_buf.append(type_str)
+                column_info.append({
+                    "name": name, "type": type_str,
+                    "nullable": col.get('nullable', True),
+                    "default": str(default) if default is not None else None
+                })
+                columns_str_parts.append(f"`{name}` ({type_str})")
+            sql_buf.append("\n);")
+            create_table_sql = "".join(sql_buf)
+
+            # 物化派生视图：概览/精简结构反复需要同一份列描述字符串，
+            # 写缓存时算好一次，读路径就只剩纯拼接
+            columns_str = ", ".join(columns_str_parts)
+
             cache_data["tables"][table_name] = {
                 "create_sql": create_table_sql, "columns": column_info,
+                "columns_str": columns_str,
                 "column_count": len(columns)
             }
-            
-            col_names = [col["name"] for col in column_info]
             description = f"Table {table_name} has {len(columns)} columns: {', '.join(col_names[:5])}"
             if len(columns) > 5:
                 description += "..."
@@ -96,13 +342,21 @@ def extract_database_info(db_config: Dict) -> Dict[str, Any]:
             }
 
         for table_name in table_names:
-            for fk in inspector.get_foreign_keys(table_name):
+            for fk in fks_by_table.get(table_name, []):
                 cache_data["relationships"].append({
                     "from_table": table_name, "from_columns": fk['constrained_columns'],
                     "to_table": fk['referred_table'], "to_columns": fk['referred_columns'],
                     "description": f"`{table_name}`.`{', '.join(fk['constrained_columns'])}` can be joined with `{fk['referred_table']}`.`{', '.join(fk['referred_columns'])}`"
                 })
 
+        # 反向索引：表名 -> 相关relationship下标。按表子集取关系时只看O(k)个
+        # 候选项，不必线性扫描全部外键
+        rel_by_table = {}
+        for i, rel in enumerate(cache_data["relationships"]):
+            rel_by_table.setdefault(rel["from_table"], []).append(i)
+            rel_by_table.setdefault(rel["to_table"], []).append(i)
+        cache_data["rel_by_table"] = rel_by_table
+
         return cache_data
 
     except (SQLAlchemyError, ValueError) as e:
@@ -131,33 +385,33 @@ def get_table_overview(db_config: Dict, force_refresh: bool = False, use_relatio
     except RuntimeError as e:
         return str(e)
 
-def format_table_overview(cache_data: Dict) -> str:
-    """Formats the cached data into a simplified string overview."""
-    overview_parts = []
-    
-    for table_name, table_data in cache_data.get("tables", {}).items():
+def _iter_table_lines(table_items) -> Iterator[str]:
+    """逐表生成概览行，直接喂给一次性的"\\n".join，不积累中间列表。"""
+    for table_name, table_data in table_items:
         columns = table_data.get("columns", [])
         if not columns:
             continue
-        
-        columns_str = ", ".join([f"`{col['name']}` ({col['type']})" for col in columns])
-        overview_parts.append(f"-- Table: `{table_name}`")
-        overview_parts.append(f"-- Columns: {columns_str}")
-
-    if cache_data.get("relationships"):
-        overview_parts.append("\n-- Relationships:")
-        for rel in cache_data["relationships"]:
-            overview_parts.append(f"-- {rel['description']}")
-    
-    return "\n".join(overview_parts)
+        # 旧缓存文件没有物化的columns_str时现算兜底
+        columns_str = table_data.get("columns_str") or ", ".join([f"`{col['name']}` ({col['type']})" for col in columns])
+        yield f"-- Table: `{table_name}`"
+        yield f"-- Columns: {columns_str}"
+
+def format_table_overview(cache_data: Dict) -> str:
+    """Formats the cached data into a simplified string overview."""
+    def _lines():
+        yield from _iter_table_lines(cache_data.get("tables", {}).items())
+        if cache_data.get("relationships"):
+            yield "\n-- Relationships:"
+            for rel in cache_data["relationships"]:
+                yield f"-- {rel['description']}"
+
+    return "\n".join(_lines())
 
 
 def format_table_overview_for_selection(cache_data: Dict) -> str:
     """
     Formats the cached data into a string overview, but only includes tables that have relationships.
     """
-    overview_parts = []
-    
     # First, find all tables that are part of any relationship
     related_tables = set()
     relationships = cache_data.get("relationships", [])
@@ -171,87 +425,137 @@ def format_table_overview_for_selection(cache_data: Dict) -> str:
         related_tables.add(rel['to_table'])
 
     # Now, build the overview string for only these tables
-    for table_name in sorted(list(related_tables)): # Sorting for consistent output
-        if table_name in cache_data.get("tables", {}):
-            table_data = cache_data["tables"][table_name]
-            columns = table_data.get("columns", [])
-            if not columns:
-                continue
-            
-            columns_str = ", ".join([f"`{col['name']}` ({col['type']})" for col in columns])
-            overview_parts.append(f"-- Table: `{table_name}`")
-            overview_parts.append(f"-- Columns: {columns_str}")
-
-    # Add the relationships section at the end
-    if relationships:
-        overview_parts.append("\n-- Relationships:")
+    tables = cache_data.get("tables", {})
+
+    def _lines():
+        yield from _iter_table_lines(
+            (table_name, tables[table_name])
+            for table_name in sorted(related_tables)  # Sorting for consistent output
+            if table_name in tables
+        )
+        # Add the relationships section at the end
+        yield "\n-- Relationships:"
         for rel in relationships:
-            overview_parts.append(f"-- {rel['description']}")
-    
-    return "\n".join(overview_parts)
+            yield f"-- {rel['description']}"
+
+    return "\n".join(_lines())
+
+def _relevant_relationship_descriptions(relationships: List[Dict], rel_by_table: Optional[Dict],
+                                        table_set: set, require_both: bool) -> List[str]:
+    """
+    Filters relationship descriptions down to the given table set.
+
+    With the `rel_by_table` inverted index (written by extract_database_info)
+    only the O(k) candidate entries touching the selected tables are checked;
+    older caches without the index fall back to a linear scan.
+    """
+    if rel_by_table is not None:
+        ids = sorted(set().union(*(rel_by_table.get(t, ()) for t in table_set))) if table_set else []
+        candidates = (relationships[i] for i in ids)
+    else:
+        candidates = iter(relationships)
+    if require_both:
+        return [
+            rel["description"] for rel in candidates
+            if rel["from_table"] in table_set and rel["to_table"] in table_set
+        ]
+    return [
+        rel["description"] for rel in candidates
+        if rel["from_table"] in table_set or rel["to_table"] in table_set
+    ]
 
 def get_simplified_schemas_for_tables(db_config: Dict, table_names: List[str]) -> str:
     """Gets the simplified schema for specific tables."""
     cache_file_path = get_cache_file_path(db_config)
-    cache_data = load_cache(cache_file_path)
-    
-    if not cache_data:
-        return "Error: Cache data not found. Please run 'Get Table Overview' first."
+    # 布隆过滤器先拒掉肯定不在缓存里的表名
+    table_names = _filter_known_tables(cache_file_path, table_names)
+    table_set = set(table_names)
 
-    overview_parts = []
-    
-    for table_name in table_names:
-        if table_name in cache_data.get("tables", {}):
-            table_data = cache_data["tables"][table_name]
-            columns = table_data.get("columns", [])
-            if not columns:
-                continue
-            
-            columns_str = ", ".join([f"`{col['name']}` ({col['type']})" for col in columns])
-            overview_parts.append(f"-- Table: `{table_name}`")
-            overview_parts.append(f"-- Columns: {columns_str}")
+    # 侧录行存在时只取所需的k行；否则回退到整份JSON缓存
+    sidecar = _sidecar_fetch(cache_file_path, table_names)
+    if sidecar is not None:
+        tables, relationships = sidecar
+        rel_by_table = None
+    else:
+        cache_data = load_cache(cache_file_path)
+        if not cache_data:
+            return "Error: Cache data not found. Please run 'Get Table Overview' first."
+        tables = cache_data.get("tables", {})
+        relationships = cache_data.get("relationships", [])
+        rel_by_table = cache_data.get("rel_by_table")
 
     # Filter relationships to only include those relevant to the selected tables
-    relevant_relationships = [
-        rel["description"] for rel in cache_data.get("relationships", [])
-        if rel["from_table"] in table_names and rel["to_table"] in table_names
-    ]
-    
-    if relevant_relationships:
-        overview_parts.append("\n-- Relationships:")
-        for rel_desc in relevant_relationships:
-            overview_parts.append(f"-- {rel_desc}")
-            
-    return "\n".join(overview_parts)
+    relevant_relationships = _relevant_relationship_descriptions(
+        relationships, rel_by_table, table_set, require_both=True
+    )
+
+    def _lines():
+        yield from _iter_table_lines(
+            (table_name, tables[table_name])
+            for table_name in table_names if table_name in tables
+        )
+        if relevant_relationships:
+            yield "\n-- Relationships:"
+            for rel_desc in relevant_relationships:
+                yield f"-- {rel_desc}"
+
+    return "\n".join(_lines())
+
+# get_specific_table_schemas的进程内TTL记忆化：SQL生成重试和验证会对同一
+# (数据库, 表集合)反复取详细结构，结果在TTL内确定不变，无需每次重新读文件拼接
+_SCHEMA_MEMO_TTL_SECONDS = 600
+_specific_schema_memo: Dict[Any, Any] = {}
+
+def invalidate_schema_memo() -> None:
+    """Clears the in-memory schema memo (call after schema refresh)."""
+    _specific_schema_memo.clear()
 
 def get_specific_table_schemas(db_config: Dict, table_names: List[str]) -> str:
     """Gets the detailed schema for specific tables."""
+    memo_key = (get_database_fingerprint(db_config), tuple(sorted(table_names)))
+    memoized = _specific_schema_memo.get(memo_key)
+    if memoized is not None and time.time() - memoized[1] < _SCHEMA_MEMO_TTL_SECONDS:
+        return memoized[0]
+
     cache_file_path = get_cache_file_path(db_config)
-    cache_data = load_cache(cache_file_path)
-    
-    if not cache_data:
-        return "Error: Cache data not found. Please run get_table_overview() first."
-    
+    # 布隆过滤器先拒掉肯定不在缓存里的表名
+    table_names = _filter_known_tables(cache_file_path, table_names)
+    table_set = set(table_names)
+
+    # 侧录行存在时只取所需的k行；否则回退到整份JSON缓存
+    sidecar = _sidecar_fetch(cache_file_path, table_names)
+    if sidecar is not None:
+        tables, relationships = sidecar
+        rel_by_table = None
+    else:
+        cache_data = load_cache(cache_file_path)
+        if not cache_data:
+            return "Error: Cache data not found. Please run get_table_overview() first."
+        tables = cache_data["tables"]
+        relationships = cache_data.get("relationships", [])
+        rel_by_table = cache_data.get("rel_by_table")
+
     detailed_schemas = [
-        cache_data["tables"][table_name]["create_sql"]
-        for table_name in table_names if table_name in cache_data["tables"]
+        tables[table_name]["create_sql"]
+        for table_name in table_names if table_name in tables
     ]
-    
-    relevant_relationships = [
-        rel["description"] for rel in cache_data.get("relationships", [])
-        if rel["from_table"] in table_names or rel["to_table"] in table_names
-    ]
-    
+
+    relevant_relationships = _relevant_relationship_descriptions(
+        relationships, rel_by_table, table_set, require_both=False
+    )
+
     if relevant_relationships:
         detailed_schemas.append("\n/*\nForeign Key Relationships:\n" + "\n".join(f"-- {rel}" for rel in relevant_relationships) + "\n*/")
-    
-    return "\n\n".join(detailed_schemas)
+
+    result = "\n\n".join(detailed_schemas)
+    _specific_schema_memo[memo_key] = (result, time.time())
+    return result
 
 def clear_cache(db_config: Optional[Dict] = None) -> None:
     """Clears cache files."""
-    script_dir = os.path.dirname(__file__)
-    cache_dir = os.path.join(script_dir, '..', 'cache')
-    
+    invalidate_schema_memo()
+    cache_dir = _CACHE_DIR
+
     if not os.path.exists(cache_dir):
         print("Cache directory does not exist.")
         return
@@ -261,6 +565,12 @@ def clear_cache(db_config: Optional[Dict] = None) -> None:
         if os.path.exists(cache_file_path):
             os.remove(cache_file_path)
             print(f"✅ Cleared cache: {cache_file_path}")
+        sidecar_path = _sidecar_db_path(cache_file_path)
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+        bloom_path = _bloom_path(cache_file_path)
+        if os.path.exists(bloom_path):
+            os.remove(bloom_path)
     else:
         cache_files = [f for f in os.listdir(cache_dir) if f.startswith("schema_cache_")]
         for cache_file in cache_files:
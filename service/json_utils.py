@@ -0,0 +1,38 @@
+# service/json_utils.py
+"""orjson优先的JSON工具。
+
+orjson的解析/序列化比标准库快3-10倍；环境中未安装时自动回退到标准库json，
+调用方无需感知差异。orjson.JSONDecodeError是json.JSONDecodeError的子类，
+因此调用方原有的异常捕获逻辑同样适用。
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """解析JSON字符串或字节串为Python对象。"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    """紧凑序列化（适合LLM上下文、缓存等对体积敏感的场景）。"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps_pretty(obj) -> str:
+    """带缩进的美化序列化（适合展示给用户或LLM阅读的场景）。"""
+    if orjson is not None:
+        return orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, indent=2)
@@ -0,0 +1,65 @@
+# service/llm_batcher.py
+"""LLM请求的并发收拢层。
+
+把同时在飞的LLM调用统一提交到一个共享的有界线程池：并发上限可控、
+底层复用llm_service的连接池（同一TCP+TLS连接），多用户/批量回归
+场景下吞吐随并发上限线性扩展，且不会把远端打挂。
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+
+try:
+    from .llm_service import call_llm_api
+except ImportError:
+    from llm_service import call_llm_api
+
+# 同时在飞的LLM请求上限；对齐llm_service中HTTPAdapter的连接池规模
+CONCURRENCY_LIMIT = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=CONCURRENCY_LIMIT, thread_name_prefix="llm"
+                )
+    return _executor
+
+
+def submit(prompt, is_json_output=False, use_cache=True) -> Future:
+    """
+    提交一次LLM调用，立即返回Future。
+
+    调用方可以先提交、继续做其他工作，再通过 future.result() 取回结果，
+    多个独立的LLM调用因此可以并行在飞。
+
+    Args:
+        prompt (str): 发送给模型的提示词
+        is_json_output (bool): 是否要求模型输出JSON格式
+        use_cache (bool): 是否先查本地响应缓存
+
+    Returns:
+        Future: 结果为call_llm_api的返回值（字符串）
+    """
+    return _get_executor().submit(call_llm_api, prompt, is_json_output, use_cache)
+
+
+def submit_task(fn, *args, **kwargs) -> Future:
+    """
+    把一个内部会发起LLM调用的函数（如问题精炼）交给共享线程池执行。
+
+    与submit共享同一并发上限，保证系统整体的在飞LLM请求数可控。
+    """
+    return _get_executor().submit(fn, *args, **kwargs)
+
+
+def map_prompts(prompts: List[str], is_json_output: bool = False) -> List[str]:
+    """批量提交多个提示词并按原顺序返回结果，适合批量回归测试等场景。"""
+    futures = [submit(prompt, is_json_output) for prompt in prompts]
+    return [future.result() for future in futures]
@@ -0,0 +1,82 @@
+# service/llm_cache.py
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Optional
+
+# Bump when prompt templates change so stale cached responses are ignored.
+PROMPT_VERSION = "1"
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'cache')
+_DB_PATH = os.path.join(_CACHE_DIR, 'llm_cache.sqlite')
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(_DB_PATH)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS llm_cache (
+            input_hash TEXT PRIMARY KEY,
+            prompt_version TEXT,
+            model_id TEXT,
+            response TEXT,
+            created_at INTEGER,
+            expires_at INTEGER
+        )"""
+    )
+    return conn
+
+
+def _input_hash(prompt: str, is_json_output: bool, model_id: str) -> str:
+    # blake2b对长提示词的哈希速度明显快于sha256，16字节摘要做键已足够
+    key = f"{PROMPT_VERSION}|{model_id}|{int(is_json_output)}|{prompt}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get(prompt: str, is_json_output: bool = False, model_id: str = "default") -> Optional[str]:
+    """Returns the cached response for this exact prompt, or None."""
+    try:
+        with _connect() as conn:
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE input_hash = ?",
+                (_input_hash(prompt, is_json_output, model_id),)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"LLM cache read failed: {e}")
+        return None
+
+    if row is None:
+        return None
+    response, expires_at = row
+    if expires_at is not None and expires_at < time.time():
+        return None
+    return response
+
+
+def put(prompt: str, is_json_output: bool, response: str,
+        model_id: str = "default", ttl_seconds: int = DEFAULT_TTL_SECONDS) -> None:
+    """Stores a response keyed by the hash of the fully-rendered prompt."""
+    now = int(time.time())
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(input_hash, prompt_version, model_id, response, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (_input_hash(prompt, is_json_output, model_id), PROMPT_VERSION,
+                 model_id, response, now, now + ttl_seconds)
+            )
+    except sqlite3.Error as e:
+        print(f"LLM cache write failed: {e}")
+
+
+def clear() -> None:
+    """Drops all cached LLM responses."""
+    try:
+        with _connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+    except sqlite3.Error as e:
+        print(f"LLM cache clear failed: {e}")
@@ -1,16 +1,46 @@
 # -*- coding: utf-8 -*-
-import requests
-import json
-from config import LLM_API_URL, GEMINI_API_KEY
+import asyncio
+import functools
+from config import LLM_API_URL_TEMPLATE, LLM_MODELS, GEMINI_API_KEY
 
-def call_llm_api(prompt, is_json_output=False):
+try:
+    from . import llm_cache
+    from . import json_utils
+except ImportError:
+    import llm_cache
+    import json_utils
+
+
+@functools.lru_cache(maxsize=1)
+def _get_session():
+    """
+    Returns a shared Session with connection pooling, so repeated LLM calls
+    reuse one TCP+TLS connection instead of paying the handshake each time.
+
+    requests在首个LLM调用时才导入，纯缓存命中的冷启动不付这笔导入开销。
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def call_llm_api(prompt, is_json_output=False, use_cache=True, model_tier="default"):
     """
     A helper function to call the Gemini API.
-    
+
     Args:
         prompt (str): The prompt to send to the model.
         is_json_output (bool): Whether to request JSON format output from the model.
-        
+        use_cache (bool): Whether to consult the on-disk response cache before
+            calling the API (identical prompts reuse the stored response).
+        model_tier (str): Which model tier to route to ("default" or "cheap").
+            Easy sub-tasks can use the cheaper/faster model without quality loss.
+
     Returns:
         str: The content returned by the model or an error message.
     """
@@ -18,6 +48,13 @@ def call_llm_api(prompt, is_json_output=False):
         # Add instruction for JSON output to the prompt
         prompt += "\n\nPlease provide the output in a valid JSON format."
 
+    model = LLM_MODELS.get(model_tier, LLM_MODELS["default"])
+
+    if use_cache:
+        cached = llm_cache.get(prompt, is_json_output, model_id=model)
+        if cached is not None:
+            return cached
+
     request_data = {
         "contents": [
             {
@@ -35,17 +72,22 @@ def call_llm_api(prompt, is_json_output=False):
         'X-goog-api-key': GEMINI_API_KEY
     }
 
+    import requests
+
     try:
-        response = requests.post(
-            LLM_API_URL,
+        # 预先用json_utils序列化并走data=，绕开requests内部的json编码器
+        response = _get_session().post(
+            LLM_API_URL_TEMPLATE.format(model=model),
             headers=headers,
-            data=json.dumps(request_data),
+            data=json_utils.dumps(request_data),
             timeout=60
         )
         response.raise_for_status()
-        response_json = response.json()
+        response_json = json_utils.loads(response.content)
         # Extract the text from the response
         content = response_json['candidates'][0]['content']['parts'][0]['text']
+        if use_cache:
+            llm_cache.put(prompt, is_json_output, content, model_id=model)
         return content
     except requests.exceptions.RequestException as e:
         return f"Error: Failed to call the Gemini API. Details: {e}"
@@ -53,3 +95,22 @@ def call_llm_api(prompt, is_json_output=False):
         return f"Error: The data format returned from the Gemini API is incorrect. Details: {e}"
     except Exception as e:
         return f"An unknown error occurred while calling the model: {e}"
+
+
+async def call_llm_api_async(prompt, is_json_output=False, use_cache=True, model_tier="default"):
+    """
+    call_llm_api的异步变体。
+
+    把同步调用投递到llm_batcher的共享线程池并await其Future，多个独立的
+    调用可以用asyncio.gather并发在飞，且与同步路径共享同一并发上限和
+    连接池。参数与call_llm_api一致。
+    """
+    try:
+        from . import llm_batcher
+    except ImportError:
+        import llm_batcher
+    future = llm_batcher.submit_task(
+        call_llm_api, prompt, is_json_output=is_json_output,
+        use_cache=use_cache, model_tier=model_tier
+    )
+    return await asyncio.wrap_future(future)
@@ -1,3 +1,6 @@
+import itertools
+import re
+
 SYSTEM_PROMPT = """你是一个MySQL专家，你的任务是将自然语言转换为MySQL查询语句。
 请注意：
 1. 只生成标准的MySQL语法
@@ -118,7 +121,54 @@ TABLE_SELECTION_PROMPT_TEMPLATE = """### 角色
 ### 必需的表名 (JSON格式):
 """
 
-SQL_GENERATION_WITH_DEPENDENCIES_PROMPT_TEMPLATE = """### 角色
+FUSED_PLANNER_PROMPT_TEMPLATE = """### 角色
+你是一位集需求分析与SQL架构于一身的数据专家。你将**在一次思考中**完成三件事：
+精炼用户问题、挑选相关数据表、并基于这些表设计SQL执行计划。
+
+### 任务步骤（在内部依次完成，最终只输出一个JSON）
+1. **精炼问题**: 把用户口语化的问题转化为一条目标指标、筛选条件、分组与排序都明确的查询式问题描述。
+2. **挑选相关表**: 从数据库概览中找出回答该问题所必需的表（包含用于JOIN的关联表）。
+3. **设计执行计划**: 遵循"能用一条SQL解决的，绝不用两条"的原则，用JOIN/CTE/窗口函数合并步骤；
+   只有当前一步的**整个结果集**是后一步的输入条件时才拆分，并通过 `{{{{param}}}}` 占位符传递。
+
+**重要**: {sql_dialect_guidance}
+
+### 输出格式
+只返回一个JSON对象，结构如下：
+```json
+{{
+  "refined_prompt": "精炼后的结构化问题描述",
+  "relevant_tables": ["Employees", "Departments"],
+  "execution_plan": [
+    {{
+      "step": 1,
+      "query_id": "unique_id",
+      "description": "这一步做什么",
+      "sql": "SELECT ...",
+      "depends_on": [],
+      "output_params": [],
+      "table_used": "Employees, Departments"
+    }}
+  ],
+  "tables_used": ["Employees", "Departments"],
+  "total_steps": 1,
+  "has_dependencies": false
+}}
+```
+
+### 数据库概览
+{table_overview}
+
+### 用户的原始问题
+{natural_language_prompt}
+
+### 你的完整计划 (JSON格式):
+"""
+
+# 提示词按"静态前缀 + 动态后缀"拆分：静态部分在前、逐次变化的内容放在末尾，
+# 这样LLM服务商的自动prompt caching能命中共享前缀，显著降低prefill成本。
+
+SQL_GENERATION_PROMPT_STATIC_PREFIX = """### 角色
 你是一位痴迷于性能优化的SQL架构师。你的核心设计哲学是：**能用一条SQL解决的，绝不用两条。** 你追求的是极致的简洁与高效。
 
 ### 任务
@@ -164,18 +214,19 @@ SQL_GENERATION_WITH_DEPENDENCIES_PROMPT_TEMPLATE = """### 角色
 
 ### 最终检查
 在输出JSON之前，请最后审视一次你的计划：这个计划是否体现了“极致简洁”的哲学？有没有可能再合并一些步骤？确认无误后，再生成JSON。
+"""
 
-{error_feedback_prompt}
-### 数据库表结构
+SQL_GENERATION_PROMPT_DYNAMIC_SUFFIX = """### 数据库表结构
 {detailed_schema}
 
+{error_feedback_prompt}
 ### 精炼后的问题
 {refined_prompt}
 
 ### 你的SQL执行计划 (JSON格式):
 """
 
-FINAL_SQL_VALIDATION_PROMPT_TEMPLATE = """### 角色
+FINAL_SQL_VALIDATION_PROMPT_STATIC_PREFIX = """### 角色
 你是一位严谨的SQL代码审查员（Code Reviewer）。你的职责是确保提交的SQL查询计划100%正确无误。
 
 ### 任务
@@ -210,8 +261,9 @@ FINAL_SQL_VALIDATION_PROMPT_TEMPLATE = """### 角色
     ```
 
 ### 审查材料
+"""
 
-#### 1. 数据库表结构
+FINAL_SQL_VALIDATION_PROMPT_DYNAMIC_SUFFIX = """#### 1. 数据库表结构
 {table_schema}
 
 #### 2. 用户问题
@@ -227,7 +279,7 @@ FINAL_SQL_VALIDATION_PROMPT_TEMPLATE = """### 角色
 ### 你的审查报告 (JSON格式):
 """
 
-SYNTHESIZE_ANSWER_PROMPT_TEMPLATE = """### 角色
+SYNTHESIZE_ANSWER_PROMPT_STATIC_PREFIX = """### 角色
 你是一位资深的数据分析师。你的目标不是简单地复述数据，而是要将数据转化为一个有见地、易于理解的故事。
 
 ### 任务
@@ -237,12 +289,13 @@ SYNTHESIZE_ANSWER_PROMPT_TEMPLATE = """### 角色
 1.  **开门见山**: 直接回答用户的核心问题。
 2.  **数据支撑**: 用关键数据来支撑你的结论，但避免罗列所有数据。
 3.  **提炼洞察**: 解释数据背后的含义。例如，不仅仅说“A产品销量最高”，而是可以引申为“A产品在本季度表现突出，是主要的增长动力”。
-4.  **引导看图 (如果适用)**: {chart_info_for_llm}
+4.  **引导看图 (如果适用)**: 如果“附加信息”中提到系统生成了图表，请自然地引导用户查看图表以获得更直观的感受。
 5.  **语言风格**: 专业、自信、友好，就像一位可靠的业务顾问。
 
 ### 分析材料
+"""
 
-#### 原始问题
+SYNTHESIZE_ANSWER_PROMPT_DYNAMIC_SUFFIX = """#### 原始问题
 {user_question}
 
 #### 查询过程回顾
@@ -251,5 +304,57 @@ SYNTHESIZE_ANSWER_PROMPT_TEMPLATE = """### 角色
 #### 核心数据
 {formatted_data}
 
+{chart_info_for_llm}
+
 ### 你的分析报告 (请直接开始撰写报告内容):
 """
+
+# 大模板每次请求都经str.format渲染，format每次都要重新解析整个模板并处理
+# {{ }} 转义。这里在导入时把模板一次性编译为"字面段/字段名"交替的序列，
+# 渲染只剩一次join，绕开format的解析状态机——典型的prepare once, execute many。
+
+_TEMPLATE_TOKEN_RE = re.compile(r'\{\{|\}\}|\{(\w+)\}')
+
+
+def compile_template(template):
+    """把format风格模板编译为渲染函数。
+
+    {{ 和 }} 转义在编译期就还原为字面花括号，完全静态的骨架固化为
+    len(字段)+1 个字面段的元组；字段替换与str.format(**kwargs)等价，
+    渲染期既无正则也无format状态机，只是|字段|+1个字符串的join。
+    """
+    static_segments = []
+    field_names = []
+    buffer = []
+    pos = 0
+    for match in _TEMPLATE_TOKEN_RE.finditer(template):
+        buffer.append(template[pos:match.start()])
+        pos = match.end()
+        field_name = match.group(1)
+        if field_name is None:
+            buffer.append(match.group(0)[0])
+        else:
+            static_segments.append("".join(buffer))
+            field_names.append(field_name)
+            buffer = []
+    buffer.append(template[pos:])
+    static_segments.append("".join(buffer))
+
+    static_segments = tuple(static_segments)
+    field_names = tuple(field_names)
+    last_segment = static_segments[-1]
+
+    def render(**kwargs):
+        return "".join(itertools.chain.from_iterable(
+            zip(static_segments, (str(kwargs[name]) for name in field_names))
+        )) + last_segment
+    return render
+
+
+render_refine_user_prompt = compile_template(REFINE_USER_PROMPT_TEMPLATE)
+render_table_selection_prompt = compile_template(TABLE_SELECTION_PROMPT_TEMPLATE)
+render_fused_planner_prompt = compile_template(FUSED_PLANNER_PROMPT_TEMPLATE)
+render_sql_generation_prefix = compile_template(SQL_GENERATION_PROMPT_STATIC_PREFIX)
+render_sql_generation_suffix = compile_template(SQL_GENERATION_PROMPT_DYNAMIC_SUFFIX)
+render_final_validation_suffix = compile_template(FINAL_SQL_VALIDATION_PROMPT_DYNAMIC_SUFFIX)
+render_synthesize_answer_suffix = compile_template(SYNTHESIZE_ANSWER_PROMPT_DYNAMIC_SUFFIX)
@@ -1,52 +1,123 @@
+import functools
+import mmap
 import os
-import json
 from typing import Dict, List, Optional
 
+try:
+    from . import json_utils
+except ImportError:
+    import json_utils
+
+
+@functools.lru_cache(maxsize=256)
+def _read_file_cached(file_path: str, mtime_ns: int) -> str:
+    """Reads a legacy per-table schema file, cached per (path, mtime)."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
 class SchemaCache:
     def __init__(self, cache_dir: str = "schema_cache"):
         self.cache_dir = os.path.join(os.path.dirname(__file__), '..', cache_dir)
         os.makedirs(self.cache_dir, exist_ok=True)
-        
+
         # Cache files
         self.tables_file = os.path.join(self.cache_dir, "tables.json")
         self.relationships_file = os.path.join(self.cache_dir, "relationships.json")
+        # 所有表结构打包进单个文件 + 偏移索引：按表取结构时mmap切片即可，
+        # 不再是每表一个.sql文件、每次拼接N次open+read系统调用
+        self.pack_file = os.path.join(self.cache_dir, "schemas.pack")
+        self.index_file = os.path.join(self.cache_dir, "schemas.idx")
+        # 旧的每表一文件布局，仅保留读取回退
         self.schemas_dir = os.path.join(self.cache_dir, "table_schemas")
-        os.makedirs(self.schemas_dir, exist_ok=True)
+
+        self._pack_mmap: Optional[mmap.mmap] = None
+        self._pack_mtime_ns: Optional[int] = None
+        self._index: Optional[Dict[str, List[int]]] = None
+        self._index_mtime_ns: Optional[int] = None
+
+    @staticmethod
+    def _atomic_write(file_path: str, content: str) -> None:
+        """Write to a same-directory temp file, then atomically replace the target."""
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+
+    def _load_index(self) -> Dict[str, List[int]]:
+        """Returns the `table_name -> [offset, length]` index for the pack file.
+
+        内存中的索引按索引文件mtime失效：其他进程更新了缓存时自动重读。
+        """
+        try:
+            mtime_ns = os.stat(self.index_file).st_mtime_ns
+        except OSError:
+            return {}
+        if self._index is None or self._index_mtime_ns != mtime_ns:
+            with open(self.index_file, 'rb') as f:
+                self._index = json_utils.loads(f.read())
+            self._index_mtime_ns = mtime_ns
+        return self._index
+
+    def _pack_view(self) -> Optional[mmap.mmap]:
+        """Returns a memory-mapped view of the pack file, refreshed on change."""
+        try:
+            stat = os.stat(self.pack_file)
+        except OSError:
+            return None
+        if stat.st_size == 0:
+            return None
+        if self._pack_mmap is None or self._pack_mtime_ns != stat.st_mtime_ns:
+            if self._pack_mmap is not None:
+                self._pack_mmap.close()
+            with open(self.pack_file, 'rb') as f:
+                self._pack_mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._pack_mtime_ns = stat.st_mtime_ns
+        return self._pack_mmap
 
     def save_table_list(self, tables: List[str]) -> None:
         """Save list of all tables"""
-        with open(self.tables_file, 'w', encoding='utf-8') as f:
-            json.dump(tables, f, ensure_ascii=False, indent=2)
+        self._atomic_write(self.tables_file, json_utils.dumps_pretty(tables))
 
     def save_relationships(self, relationships: List[Dict]) -> None:
         """Save table relationships"""
-        with open(self.relationships_file, 'w', encoding='utf-8') as f:
-            json.dump(relationships, f, ensure_ascii=False, indent=2)
+        self._atomic_write(self.relationships_file, json_utils.dumps_pretty(relationships))
 
     def save_table_schema(self, table_name: str, schema: str) -> None:
         """Save schema for a single table"""
-        file_path = os.path.join(self.schemas_dir, f"{table_name}.sql")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(schema)
+        # 追加写入pack并更新索引；重复保存同一张表时索引指向最新条目
+        encoded = schema.encode('utf-8')
+        index = self._load_index()
+        with open(self.pack_file, 'ab') as f:
+            offset = f.tell()
+            f.write(encoded)
+        index[table_name] = [offset, len(encoded)]
+        self._atomic_write(self.index_file, json_utils.dumps_pretty(index))
 
     def get_table_list(self) -> Optional[List[str]]:
         """Get list of all tables"""
         try:
-            with open(self.tables_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.tables_file, 'rb') as f:
+                return json_utils.loads(f.read())
         except FileNotFoundError:
             return None
 
     def get_relationships(self) -> Optional[List[Dict]]:
         """Get table relationships"""
         try:
-            with open(self.relationships_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.relationships_file, 'rb') as f:
+                return json_utils.loads(f.read())
         except FileNotFoundError:
             return None
 
     def get_table_schema(self, table_name: str) -> Optional[str]:
         """Get schema for a single table"""
+        entry = self._load_index().get(table_name)
+        if entry is not None:
+            view = self._pack_view()
+            if view is not None:
+                offset, length = entry
+                return view[offset:offset + length].decode('utf-8')
+        # 回退：打包文件之前的每表一文件布局
         file_path = os.path.join(self.schemas_dir, f"{table_name}.sql")
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -54,14 +125,44 @@ class SchemaCache:
         except FileNotFoundError:
             return None
 
+    def get_all_schemas(self) -> Dict[str, str]:
+        """Get all table schemas in one call.
+
+        批量读取路径：pack里的条目直接mmap切片，旧布局的.sql文件经
+        (路径, mtime)键的LRU读取；调用方取N张表时调用一次再按键取值，
+        不必N次get_table_schema。
+        """
+        schemas = {}
+        index = self._load_index()
+        view = self._pack_view()
+        if view is not None:
+            for name, (offset, length) in index.items():
+                schemas[name] = view[offset:offset + length].decode('utf-8')
+        if os.path.isdir(self.schemas_dir):
+            with os.scandir(self.schemas_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.sql'):
+                        name = entry.name[:-4]
+                        if name not in schemas:
+                            schemas[name] = _read_file_cached(entry.path, entry.stat().st_mtime_ns)
+        return schemas
+
     def get_schemas_for_tables(self, table_names: List[str]) -> str:
         """Get combined schema for specified tables"""
+        index = self._load_index()
+        view = self._pack_view()
+
         schemas = []
         for table in table_names:
-            schema = self.get_table_schema(table)
-            if schema:
-                schemas.append(schema)
-        
+            entry = index.get(table)
+            if entry is not None and view is not None:
+                offset, length = entry
+                schemas.append(view[offset:offset + length].decode('utf-8'))
+            else:
+                schema = self.get_table_schema(table)
+                if schema:
+                    schemas.append(schema)
+
         relationships = self.get_relationships() or []
         rel_text = []
         for rel in relationships:
@@ -71,5 +172,5 @@ class SchemaCache:
         final_schema = "\n\n".join(schemas)
         if rel_text:
             final_schema += "\n\n/*\nForeign Key Relationships:\n" + "\n".join(rel_text) + "\n*/"
-        
+
         return final_schema
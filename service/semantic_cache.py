@@ -0,0 +1,90 @@
+# service/semantic_cache.py
+import hashlib
+import time
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+
+def default_embed(text: str, dim: int = 256) -> np.ndarray:
+    """
+    Embeds text as an L2-normalized character n-gram hashing vector.
+
+    This is a dependency-free stand-in for a neural embedding model: near-
+    duplicate questions map to nearly identical vectors, which is all the
+    cache needs to recognize repeat queries.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    lowered = text.lower()
+    for n in (2, 3):
+        for i in range(len(lowered) - n + 1):
+            gram = lowered[i:i + n].encode('utf-8')
+            bucket = int.from_bytes(hashlib.blake2b(gram, digest_size=4).digest(), 'little') % dim
+            vec[bucket] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticCache:
+    """
+    In-process semantic cache for LLM call results.
+
+    Entries are keyed by an embedding of the input text; lookups return the
+    cached result whose embedding has the highest cosine similarity above
+    `threshold`. Entries expire after `ttl_seconds` and the least recently
+    used entry is evicted once `max_size` is reached. An optional `scope`
+    string (e.g. a schema hash) restricts matches to entries stored under
+    the same scope.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], np.ndarray] = default_embed,
+                 threshold: float = 0.85, max_size: int = 256, ttl_seconds: int = 3600):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._matrix: Optional[np.ndarray] = None  # one L2-normalized row per entry
+        self._entries: List[dict] = []             # parallel to _matrix rows
+
+    def _prune_expired(self) -> None:
+        if not self._entries:
+            return
+        now = time.time()
+        keep = [i for i, entry in enumerate(self._entries) if now - entry["timestamp"] < self.ttl_seconds]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = self._matrix[keep] if keep else None
+
+    def get(self, text: str, scope: str = "") -> Optional[Any]:
+        """Returns the cached result for the closest stored text, or None."""
+        self._prune_expired()
+        if self._matrix is None or not len(self._entries):
+            return None
+
+        query = self.embed_fn(text)
+        scores = self._matrix @ query
+        in_scope = [i for i, entry in enumerate(self._entries) if entry["scope"] == scope]
+        if not in_scope:
+            return None
+
+        best = max(in_scope, key=lambda i: scores[i])
+        if scores[best] < self.threshold:
+            return None
+
+        entry = self._entries[best]
+        entry["timestamp"] = time.time()  # refresh for LRU/TTL purposes
+        return entry["result"]
+
+    def put(self, text: str, result: Any, scope: str = "") -> None:
+        """Stores a result under the embedding of `text`."""
+        self._prune_expired()
+        if len(self._entries) >= self.max_size:
+            # Evict the least recently used entry.
+            oldest = min(range(len(self._entries)), key=lambda i: self._entries[i]["timestamp"])
+            keep = [i for i in range(len(self._entries)) if i != oldest]
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = self._matrix[keep] if keep else None
+
+        vector = self.embed_fn(text).reshape(1, -1)
+        self._matrix = vector if self._matrix is None else np.vstack([self._matrix, vector])
+        self._entries.append({"result": result, "scope": scope, "timestamp": time.time()})
@@ -0,0 +1,68 @@
+# service/sql_static_check.py
+"""SQL的本地静态校验。
+
+语法错误、表/列不存在、非SQLite函数这类问题，数据库自己在微秒级就能
+发现（EXPLAIN QUERY PLAN只解析不执行），不必多花一次LLM往返去审查。
+只有静态检查全部通过、剩下语义层面的疑问时，才交给LLM验证。
+"""
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+# 执行计划中跨步骤传参的占位符，如 IN ({{department_ids}})；
+# 静态检查时用NULL顶替，使语句可被解析
+_PARAM_PLACEHOLDER_RE = re.compile(r'\{\{[^}]+\}\}')
+
+
+def _sqlite_db_path(db_config: Dict) -> Optional[str]:
+    """按DatabaseService的约定解析SQLite数据库文件的路径。"""
+    db_filename = db_config.get('database_path')
+    if not db_filename:
+        return None
+    script_dir = os.path.dirname(__file__)
+    full_db_path = os.path.join(script_dir, '..', 'data', db_filename)
+    return full_db_path if os.path.exists(full_db_path) else None
+
+
+def static_validate(sqls: List[str], db_config: Dict) -> Optional[str]:
+    """
+    用数据库自身的解析器对SQL列表做本地静态校验。
+
+    Args:
+        sqls (List[str]): 待校验的SQL语句列表
+        db_config (dict): 数据库连接配置
+
+    Returns:
+        Optional[str]: 发现问题时返回错误描述（可直接作为重试的last_error）；
+            全部通过或当前数据库类型不支持本地校验时返回None。
+    """
+    if db_config.get('database_type', '').lower() != 'sqlite':
+        return None
+
+    db_path = _sqlite_db_path(db_config)
+    if db_path is None:
+        return None
+
+    try:
+        # 只读方式打开，保证校验绝不改动数据
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+
+    try:
+        for i, sql in enumerate(sqls):
+            statement = _PARAM_PLACEHOLDER_RE.sub('NULL', sql).strip()
+            if not statement:
+                return f"第{i+1}条SQL为空。"
+            if not sqlite3.complete_statement(statement.rstrip(';') + ';'):
+                return f"第{i+1}条SQL不是完整的语句: {sql}"
+            try:
+                # EXPLAIN QUERY PLAN 让SQLite完整解析语句（含表/列名检查）但不执行
+                conn.execute(f"EXPLAIN QUERY PLAN {statement}")
+            except sqlite3.Error as e:
+                return f"第{i+1}条SQL未通过数据库静态检查: {e}。SQL: {sql}"
+    finally:
+        conn.close()
+
+    return None
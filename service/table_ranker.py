@@ -0,0 +1,70 @@
+# service/table_ranker.py
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .semantic_cache import default_embed
+
+
+def build_table_embeddings(db_config: Dict) -> Dict[str, np.ndarray]:
+    """
+    Builds one embedding per table from its name plus column summary.
+
+    Reads the schema cache written by get_table_overview(); tables missing
+    from the cache are embedded from their name alone. The result should be
+    computed once per schema and reused (e.g. kept in st.session_state).
+    """
+    from .get_table_schema import get_cache_file_path, load_cache
+
+    cache_data = load_cache(get_cache_file_path(db_config)) or {}
+    summaries = cache_data.get("table_summary", {})
+
+    embeddings = {}
+    for table_name, summary in summaries.items():
+        column_names = summary.get("column_names", [])
+        text = f"{table_name} {' '.join(column_names)}"
+        embeddings[table_name] = default_embed(text)
+    return embeddings
+
+
+# 每个schema指纹对应一份表embedding，进程内算一次反复复用
+_embeddings_memo: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+def get_table_embeddings(db_config: Dict) -> Dict[str, np.ndarray]:
+    """Returns the table embeddings for this database, memoized per schema fingerprint."""
+    from .get_table_schema import get_database_fingerprint
+
+    fingerprint = get_database_fingerprint(db_config)
+    embeddings = _embeddings_memo.get(fingerprint)
+    if embeddings is None:
+        embeddings = build_table_embeddings(db_config)
+        _embeddings_memo[fingerprint] = embeddings
+    return embeddings
+
+
+def rank_relevant_tables(question: str, table_embeddings: Dict[str, np.ndarray],
+                         top_k: int = 5, threshold: float = 0.3,
+                         margin: float = 0.05) -> List[str]:
+    """
+    Ranks tables by cosine similarity between the question and each table's
+    embedding, returning up to `top_k` tables scoring above `threshold`.
+
+    Confidence check: if the best selected table barely beats the first
+    excluded one (difference below `margin`), the ranking is ambiguous and
+    an empty list is returned — callers should fall back to the LLM-based
+    selection in that case.
+    """
+    if not table_embeddings:
+        return []
+
+    query = default_embed(question)
+    scored = [(float(vector @ query), table) for table, vector in table_embeddings.items()]
+    scored.sort(reverse=True)
+
+    selected = [(score, table) for score, table in scored[:top_k] if score > threshold]
+    if not selected:
+        return []
+    if len(scored) > top_k and selected[0][0] - scored[top_k][0] < margin:
+        return []
+    return [table for score, table in selected]